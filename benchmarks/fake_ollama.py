@@ -0,0 +1,195 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prompt template and default system prompt processed with every uncached prompt
+TEMPLATE_CHARS = 200
+WORDS = ["the", "quick", "answer", "is", "simple", "and", "clear", "enough", "for", "now"]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Ollama HTTP API used by LLMHandler"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, payload):
+        data = json.dumps(payload).encode('utf-8') + b'\n'
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        body = b"Ollama is running"
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.path not in ('/api/generate', '/api/chat'):
+            self._send_json(404, {"error": "not found"})
+            return
+        chat = self.path == '/api/chat'
+
+        with server.lock:
+            server.request_count += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            if not chat and not payload.get('prompt'):
+                # Model load request (warm-up)
+                self._send_json(200, {"model": payload.get('model'), "response": "", "done": True})
+                return
+            if not payload.get('stream', True):
+                time.sleep(server.first_token_delay + server.tokens / server.token_rate)
+                self._send_json(200, {"model": payload.get('model'), "response": server.answer(), "done": True})
+                return
+
+            if server.slots is not None:
+                server.slots.acquire()
+            try:
+                self._stream(server, payload, chat)
+            finally:
+                if server.slots is not None:
+                    server.slots.release()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _stream(self, server, payload, chat):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(server.first_token_delay + server.prefill_seconds(payload, chat))
+        for token in server.answer_tokens():
+            if chat:
+                self._write_chunk({"model": payload.get('model'), "done": False,
+                                   "message": {"role": "assistant", "content": token}})
+            else:
+                self._write_chunk({"model": payload.get('model'), "response": token, "done": False})
+            time.sleep(1.0 / server.token_rate)
+        done = {"model": payload.get('model'), "done": True, "eval_count": server.tokens}
+        if chat:
+            done["message"] = {"role": "assistant", "content": ""}
+            server.remember_chat(payload['messages'] + [{"role": "assistant", "content": server.answer()}])
+        else:
+            done["response"] = ""
+            done["context"] = server.next_context(payload)
+        self._write_chunk(done)
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """Fake Ollama server with a configurable first-token delay and token rate.
+
+    With `prefill_rate` (characters per second) the first token is further
+    delayed by the prompt text the model has not seen yet: text covered by
+    the `context` of an earlier answer, or an already answered chat prefix,
+    is free, as with Ollama's prompt cache. `slots` limits how many
+    requests are generated at the same time.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, token_rate=50.0, first_token_delay=0.2, tokens=40,
+                 prefill_rate=None, slots=None):
+        super().__init__((host, port), FakeOllamaHandler)
+        self.token_rate = token_rate
+        self.first_token_delay = first_token_delay
+        self.tokens = tokens
+        self.prefill_rate = prefill_rate
+        # Like OLLAMA_NUM_PARALLEL: further requests wait for a free slot
+        self.slots = threading.Semaphore(slots) if slots else None
+        self._chats = set()
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.active = 0
+        self.max_active = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self):
+        return f"{self.base_url}/api/generate"
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-answer (e.g. a closed keep-alive pool) are expected
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+    def answer_tokens(self):
+        """Tokens of the canned answer: words grouped into eight-word sentences"""
+        for idx in range(self.tokens):
+            word = WORDS[idx % len(WORDS)]
+            yield f"{word}. " if idx % 8 == 7 else f"{word} "
+
+    def answer(self):
+        return ''.join(self.answer_tokens())
+
+    def next_context(self, payload):
+        """Opaque context tokens returned with a finished generate request"""
+        return list(payload.get('context') or []) + [self.request_count]
+
+    @staticmethod
+    def _chat_key(messages):
+        # Clients may normalize whitespace of the answers they send back
+        return json.dumps([(m.get('role'), ' '.join(m.get('content', '').split())) for m in messages])
+
+    def remember_chat(self, messages):
+        with self.lock:
+            self._chats.add(self._chat_key(messages))
+
+    def prefill_seconds(self, payload, chat):
+        """Simulated prompt processing time for the text that isn't cached yet"""
+        if not self.prefill_rate:
+            return 0.0
+        if chat:
+            messages = payload.get('messages', [])
+            new = messages
+            with self.lock:
+                for end in range(len(messages) - 1, 0, -1):
+                    if self._chat_key(messages[:end]) in self._chats:
+                        new = messages[end:]
+                        break
+            chars = sum(len(message.get('content', '')) for message in new)
+            cached = new is not messages
+        else:
+            chars = len(payload.get('system', '')) + len(payload.get('prompt', ''))
+            cached = bool(payload.get('context'))
+        if not cached:
+            chars += TEMPLATE_CHARS
+        return chars / self.prefill_rate
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-ollama', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
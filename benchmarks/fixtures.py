@@ -0,0 +1,45 @@
+import math
+import struct
+import wave
+from pathlib import Path
+
+
+def speech_like_pcm(seconds, sample_rate=16000, amplitude=6000, burst_s=0.6, pause_s=0.3):
+    """16-bit mono PCM of tone bursts separated by short pauses"""
+    samples = []
+    period = burst_s + pause_s
+    for idx in range(int(seconds * sample_rate)):
+        t = idx / sample_rate
+        if t % period < burst_s:
+            # Two tones so the signal isn't a pure sine
+            value = amplitude * (0.6 * math.sin(2 * math.pi * 220 * t) + 0.4 * math.sin(2 * math.pi * 340 * t))
+        else:
+            value = 0
+        samples.append(int(value))
+    return struct.pack(f'<{len(samples)}h', *samples)
+
+
+def write_wav(path, pcm, sample_rate=16000):
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm)
+
+
+def generate_fixtures(directory, count, seconds=3.0, silent=0):
+    """Write `count` speech-like WAV files (plus `silent` silent ones) and return their names"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    pcm = speech_like_pcm(seconds)
+    names = []
+    for idx in range(count):
+        name = f"bench_{idx:04d}.wav"
+        # Vary one sample so every file has a different content hash
+        write_wav(directory / name, struct.pack('<h', idx) + pcm[2:])
+        names.append(name)
+    for idx in range(silent):
+        name = f"bench_silent_{idx:04d}.wav"
+        write_wav(directory / name, struct.pack('<h', idx) + b'\0' * (len(pcm) - 2))
+        names.append(name)
+    return names
@@ -0,0 +1,267 @@
+"""Offline end-to-end benchmark for the audio processing flow.
+
+Runs the real decode -> transcribe -> LLM -> TTS -> persist steps against a
+local fake Ollama server, stub STT/TTS backends and synthetic audio
+fixtures, so no network services are needed. Reports per-stage and
+end-to-end timings and can act as a regression gate:
+
+    python -m benchmarks.run_benchmark --files 1 8 --save bench.json
+    python -m benchmarks.run_benchmark --files 1 8 --baseline bench.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+CONFIG_TEMPLATE = '''OLLAMA_API_URL = {api_url!r}
+MODEL_NAME = "bench-model"
+LANGUAGE = "en-US"
+WAKE_WORD = "jarvis"
+RATE = 150
+VOLUME = 1.0
+VOICE_ID = 0
+LLM_CACHE_ENABLED = {caches!r}
+TTS_CACHE_ENABLED = {caches!r}
+INGEST_MANIFEST_ENABLED = False
+OLLAMA_WARM_UP = False
+PIPELINE_WORKERS = {workers!r}
+LLM_CONVERSATION_MODE = {conversation!r}
+OLLAMA_ENDPOINTS = {endpoints!r}
+COALESCE_REQUESTS = {coalesce!r}
+'''
+
+
+def timed_decode(job):
+    """Decode step that records its duration in the job (runs in worker processes)"""
+    from main import decode_job
+    started = time.perf_counter()
+    result = decode_job(job)
+    job.setdefault('timings', {})['decode'] = time.perf_counter() - started
+    return result
+
+
+def timed(stage, step):
+    def run(job):
+        started = time.perf_counter()
+        try:
+            return step(job)
+        finally:
+            job.setdefault('timings', {})[stage] = time.perf_counter() - started
+    return run
+
+
+def timed_writes(writer):
+    """Record how long each background write takes, from submit until it is written"""
+    durations = []
+    submit = writer.submit
+
+    def timed_submit(*args, **kwargs):
+        started = time.perf_counter()
+        future = submit(*args, **kwargs)
+        future.add_done_callback(lambda _: durations.append(time.perf_counter() - started))
+        return future
+
+    writer.submit = timed_submit
+    return durations
+
+
+def prepare_workspace(args, servers):
+    """Create a scratch working directory with its own config_local.py"""
+    workspace = Path(tempfile.mkdtemp(prefix='jarvis-bench-'))
+    for dir_path in ['resources/input', 'resources/output/text', 'resources/output/audio', 'resources/temp']:
+        (workspace / dir_path).mkdir(parents=True, exist_ok=True)
+    (workspace / 'config_local.py').write_text(CONFIG_TEMPLATE.format(
+        api_url=servers[0].api_url, endpoints=[server.base_url for server in servers],
+        caches=args.with_caches, workers=args.workers, conversation=args.conversation,
+        coalesce=args.coalesce,
+    ))
+    # Worker processes need to find the config and the project as well
+    paths = [str(workspace), str(REPO_ROOT)]
+    sys.path[:0] = paths
+    os.environ['PYTHONPATH'] = os.pathsep.join(paths + [os.environ.get('PYTHONPATH', '')])
+    os.chdir(workspace)
+    return workspace
+
+
+def build_transcript(questions, file_idx):
+    return ' '.join(f"jarvis what is question {q} of file {file_idx}" for q in range(1, questions + 1))
+
+
+def run_once(args, mode, files):
+    """Process `files` fixtures in one mode and return the collected timings"""
+    import main
+    from src.engine import JarvisEngine
+    from src.pipeline import Pipeline, Stage
+    from benchmarks.fixtures import generate_fixtures
+    from benchmarks.stubs import StubSTTBackend, StubTTS
+
+    # Every run starts from a fresh input directory (decode workers read it too)
+    input_dir = Path('resources/input')
+    shutil.rmtree(input_dir, ignore_errors=True)
+    names = generate_fixtures(input_dir, files, seconds=args.audio_seconds)
+
+    engine = JarvisEngine('jarvis')
+    # Every file gets its own questions (each file is transcribed once)
+    transcripts = [build_transcript(args.questions, idx) for idx in range(files)]
+    engine.audio_proc.stt_backend = StubSTTBackend(transcripts, args.stt_latency)
+    engine.audio_proc.tts_backend = StubTTS(args.tts_latency)
+    # With the background writer the persist step only queues the write
+    writes = timed_writes(engine.persistence) if engine.persistence is not None else None
+
+    steps = [(name, timed(name, step)) for name, step in main.build_steps(engine)]
+    started = time.perf_counter()
+    if mode == 'pipeline':
+        workers = dict(main.DEFAULT_PIPELINE_WORKERS, **args.workers)
+        stages = [Stage('decode', timed_decode, workers['decode'], args.queue_size, use_processes=True)]
+        stages += [Stage(name, step, workers[name], args.queue_size) for name, step in steps]
+        jobs = Pipeline(stages).run(main.new_job(name) for name in names)
+    else:
+        jobs = []
+        for name in names:
+            job = timed_decode(main.new_job(name))
+            for _, step in steps:
+                if not job:
+                    break
+                job = step(job)
+            if job:
+                jobs.append(job)
+    if writes is not None:
+        # Count the writes still queued, so persistence stays inside the timed run
+        engine.persistence.flush()
+    wall = time.perf_counter() - started
+    engine.close()
+
+    stages = {}
+    for job in jobs:
+        for stage, seconds in job.get('timings', {}).items():
+            stages.setdefault(stage, []).append(seconds)
+    if writes:
+        stages['persist'] = writes
+    return {
+        "mode": mode,
+        "files": files,
+        "questions": args.questions,
+        "completed": len(jobs),
+        "wall": round(wall, 3),
+        "files_per_second": round(len(jobs) / wall, 3) if wall else None,
+        "stages": {
+            stage: {
+                "count": len(values),
+                "mean": round(statistics.mean(values), 4),
+                "p50": round(statistics.median(values), 4),
+                "p95": round(sorted(values)[max(0, int(len(values) * 0.95) - 1)], 4),
+                "max": round(max(values), 4),
+            }
+            for stage, values in stages.items()
+        },
+    }
+
+
+def print_report(results):
+    for result in results:
+        print(f"\n== {result['mode']}: {result['files']} file(s) x {result['questions']} question(s) ==")
+        print(f"completed {result['completed']}/{result['files']} in {result['wall']:.2f}s "
+              f"({result['files_per_second']} files/s)")
+        print(f"{'stage':<12}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+        for stage in ['decode', 'transcribe', 'llm', 'tts', 'persist']:
+            if stage in result['stages']:
+                s = result['stages'][stage]
+                print(f"{stage:<12}{s['count']:>7}{s['mean']:>10.3f}{s['p50']:>10.3f}{s['p95']:>10.3f}{s['max']:>10.3f}")
+
+
+def check_regressions(results, baseline_path, tolerance):
+    """Return descriptions of runs whose wall time regressed beyond `tolerance`"""
+    baseline = json.loads(Path(baseline_path).read_text())
+    previous = {(run['mode'], run['files'], run['questions']): run for run in baseline['runs']}
+    failures = []
+    for result in results:
+        before = previous.get((result['mode'], result['files'], result['questions']))
+        if before and result['wall'] > before['wall'] * (1 + tolerance):
+            failures.append(f"{result['mode']} x{result['files']}: {result['wall']:.2f}s "
+                            f"vs baseline {before['wall']:.2f}s")
+    return failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Jarvis throughput/latency benchmark")
+    parser.add_argument('--files', type=int, nargs='+', default=[1, 4], help="file counts to benchmark")
+    parser.add_argument('--questions', type=int, default=3, help="questions per recording")
+    parser.add_argument('--mode', nargs='+', choices=['sequential', 'pipeline'],
+                        default=['sequential', 'pipeline'])
+    parser.add_argument('--token-rate', type=float, default=50.0, help="fake LLM tokens per second")
+    parser.add_argument('--first-token-delay', type=float, default=0.2, help="fake LLM delay before the first token")
+    parser.add_argument('--tokens', type=int, default=40, help="tokens per fake answer")
+    parser.add_argument('--prefill-rate', type=float, help="fake LLM prompt processing speed in characters/s")
+    parser.add_argument('--llm-slots', type=int, help="requests the fake LLM generates at once (default: unlimited)")
+    parser.add_argument('--llm-servers', type=int, default=1, help="fake LLM servers to balance the requests over")
+    parser.add_argument('--conversation', choices=['context', 'chat'],
+                        help="ask each recording's questions as one conversation (LLM_CONVERSATION_MODE)")
+    parser.add_argument('--stt-latency', type=float, default=0.2, help="stub recognizer latency per call")
+    parser.add_argument('--tts-latency', type=float, default=0.05, help="stub TTS latency per segment")
+    parser.add_argument('--audio-seconds', type=float, default=3.0, help="length of each audio fixture")
+    parser.add_argument('--queue-size', type=int, default=8)
+    parser.add_argument('--workers', type=json.loads, default={}, help='stage workers as JSON, e.g. \'{"llm": 4}\'')
+    parser.add_argument('--with-caches', action='store_true', help="keep the LLM and TTS caches enabled")
+    parser.add_argument('--coalesce', action='store_true',
+                        help="merge identical LLM/TTS requests in flight together (COALESCE_REQUESTS)")
+    parser.add_argument('--keep-workspace', action='store_true', help="keep the scratch directory for inspection")
+    parser.add_argument('--trace', help="write per-span timings (JSONL) to this file")
+    parser.add_argument('--save', help="write the results as JSON (usable as a baseline)")
+    parser.add_argument('--baseline', help="fail if wall time regressed against this results file")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown against the baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    baseline = Path(args.baseline).resolve() if args.baseline else None
+    save = Path(args.save).resolve() if args.save else None
+    trace = Path(args.trace).resolve() if args.trace else None
+
+    from benchmarks.fake_ollama import FakeOllamaServer
+    servers = [
+        FakeOllamaServer(token_rate=args.token_rate, first_token_delay=args.first_token_delay,
+                         tokens=args.tokens, prefill_rate=args.prefill_rate, slots=args.llm_slots).start()
+        for _ in range(args.llm_servers)
+    ]
+    workspace = None
+    try:
+        workspace = prepare_workspace(args, servers)
+        import logging
+        import main as jarvis_main
+        jarvis_main.setup_logging()
+        logging.getLogger().setLevel(logging.WARNING)
+        if trace:
+            from src.metrics import configure_metrics
+            configure_metrics(trace_file=str(trace))
+
+        results = [run_once(args, mode, files) for files in args.files for mode in args.mode]
+    finally:
+        for server in servers:
+            server.stop()
+        if workspace is not None and not args.keep_workspace:
+            os.chdir(REPO_ROOT)
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    print_report(results)
+    if save:
+        save.write_text(json.dumps({"runs": results}, indent=2))
+        print(f"\nResults saved to {save}")
+    if baseline:
+        failures = check_regressions(results, baseline, args.tolerance)
+        if failures:
+            print("\n❌ Performance regression:\n  " + "\n  ".join(failures))
+            return 1
+        print("\n✅ No regression against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
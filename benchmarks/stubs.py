@@ -0,0 +1,46 @@
+import itertools
+import threading
+import time
+from src.stt_backends import STTBackend
+
+
+class StubSTTBackend(STTBackend):
+    """Speech-to-text stand-in that returns canned transcripts after a delay.
+
+    `transcripts` is one transcript or a list handed out in turn, one per
+    call (so each file of a run can get its own questions).
+    """
+
+    name = 'stub'
+
+    def __init__(self, transcripts, latency=0.1, language='en-US'):
+        super().__init__(language)
+        if isinstance(transcripts, str):
+            transcripts = [transcripts]
+        self._transcripts = itertools.cycle(transcripts)
+        self._lock = threading.Lock()
+        self.latency = latency
+
+    def _recognize(self, audio):
+        time.sleep(self.latency)
+        with self._lock:
+            return next(self._transcripts), 1.0
+
+
+class StubTTS:
+    """Text-to-speech stand-in with a fixed per-call latency.
+
+    Returns silent MP3 frames in the format gTTS produces (MPEG-2 layer III,
+    24 kHz mono, 32 kbit/s), a few bytes per character so output sizes and
+    durations still scale with the amount of text.
+    """
+
+    FRAME = b'\xff\xf3\x44\xc0' + b'\0' * 92
+
+    def __init__(self, latency=0.05, bytes_per_char=64):
+        self.latency = latency
+        self.bytes_per_char = bytes_per_char
+
+    def __call__(self, text, lang='en'):
+        time.sleep(self.latency)
+        return self.FRAME * max(1, len(text) * self.bytes_per_char // len(self.FRAME))
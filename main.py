@@ -1,23 +1,36 @@
-from src.audio_processor import AudioProcessor
-from src.text_processor import TextProcessor
-from src.file_handler import FileHandler
-from src.llm_handler import LLMHandler
+import argparse
+import logging
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-import logging
-from config_local import WAKE_WORD
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('resources/output/jarvis.log')
-    ]
-)
+from src.metrics import bind, configure_metrics, metrics, span, tagged, tracer
+from src.llm_stream import StreamResult
+from src.pipeline import Pipeline, Stage
+from src.settings import config_loaded, setting, validate_settings
+from src.text_processor import end_sentence
+
+# Audio, speech and HTTP backends are imported by the functions that use
+# them, so commands such as `list` start without loading them
+
+DEFAULT_PIPELINE_WORKERS = {'decode': 2, 'transcribe': 4, 'llm': 2, 'tts': 4, 'persist': 1}
+
 logger = logging.getLogger(__name__)
 
+def setup_logging():
+    """Log to the console and resources/output/jarvis.log"""
+    Path('resources/output').mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler('resources/output/jarvis.log')
+        ]
+    )
+
 def chunk_text(text, chunk_size=1000):
     """Split text into chunks at sentence boundaries"""
     words = text.split()
@@ -41,108 +54,625 @@ def chunk_text(text, chunk_size=1000):
     
     return chunks
 
-def process_audio_file(audio_file):
-    # Initialize components
-    audio_proc = AudioProcessor('resources/input', 'resources/output', 'resources/temp')
-    text_proc = TextProcessor(WAKE_WORD)
-    file_handler = FileHandler('resources/output')
-    llm_handler = LLMHandler()
+_timestamp_lock = threading.Lock()
+_last_timestamp = [None, 0]
+
+def new_timestamp():
+    """Return a conversation timestamp that is unique within this process"""
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    with _timestamp_lock:
+        if _last_timestamp[0] == timestamp:
+            _last_timestamp[1] += 1
+            return f"{timestamp}_{_last_timestamp[1]}"
+        _last_timestamp[0], _last_timestamp[1] = timestamp, 1
+        return timestamp
+
+@lru_cache(maxsize=None)
+def get_prescreen():
+    """Energy pre-screen configured from the settings (one per process)"""
+    from src.prescreen import SpeechPrescreen
+    return SpeechPrescreen(
+        energy_threshold=setting('PRESCREEN_ENERGY_THRESHOLD', 300),
+        min_speech_seconds=setting('PRESCREEN_MIN_SPEECH_SECONDS', 0.5),
+        min_speech_ratio=setting('PRESCREEN_MIN_SPEECH_RATIO', 0.02),
+        trim=setting('PRESCREEN_TRIM', True),
+    )
+
+# Decoder used by the worker processes of the decode stage
+_decode_audio_proc = None
+
+def decode_job(job, audio_proc=None):
+    """Decode the input file of a job into memory (or a WAV file)"""
+    if 'questions' in job:
+        # Already transcribed in an earlier run
+        return job
+    # This usually runs in a worker process, so the span travels back with
+    # the job and is emitted by the next stage
+    with span('decode', emit=False, file=job['audio_file']) as decode_span:
+        result = _decode_job(job, audio_proc)
+    if result is None:
+        tracer.emit(decode_span.record())
+        return None
+    result.setdefault('pending_spans', []).append(decode_span.record())
+    return result
+
+def _decode_job(job, audio_proc):
+    global _decode_audio_proc
+    if audio_proc is None:
+        if _decode_audio_proc is None:
+            from src.audio_processor import AudioProcessor
+            _decode_audio_proc = AudioProcessor('resources/input', 'resources/output', 'resources/temp')
+        audio_proc = _decode_audio_proc
 
-    # Transcribe audio
+    # Long recordings are stream-decoded segment by segment in the transcribe stage
+    min_bytes = setting('SEGMENTED_TRANSCRIPTION_MIN_BYTES', 2 * 1024 * 1024)
+    input_path = audio_proc.input_dir / job['audio_file']
+    if min_bytes is not None and input_path.exists() and input_path.stat().st_size >= min_bytes:
+        job['segmented'] = True
+        return job
+
+    if setting('DECODE_IN_MEMORY', True):
+        audio_data = audio_proc.decode_audio_data(job['audio_file'])
+        if audio_data is None:
+            return None
+        if setting('PRESCREEN_ENABLED', True):
+            audio_data, job['prescreen'] = get_prescreen().screen(audio_data)
+            if audio_data is None:
+                # Nothing worth sending to the recognizer
+                job['no_speech'] = True
+                return job
+        job['audio_data'] = audio_data
+        return job
+
+    wav_path = audio_proc.decode_audio(job['audio_file'])
+    if not wav_path:
+        return None
+    job['wav_path'] = wav_path
+    job['wav_is_temp'] = wav_path != str(audio_proc.input_dir / job['audio_file'])
+    return job
+
+def transcribe_job(job, engine):
+    """Transcribe a decoded file and split it into questions"""
+    audio_file = job['audio_file']
     logger.info(f"Starting to process audio file: {audio_file}")
-    transcribed_text = audio_proc.transcribe_audio(audio_file)
-    
+    if job.get('no_speech'):
+        logger.info(f"No speech detected in {audio_file}. Skipping recognition.")
+        job['transcript'] = ""
+        job['questions'] = []
+        return None
+
+    with span('stt', backend=engine.audio_proc.stt_backend.name) as stt_span:
+        if job.get('segmented'):
+            transcribed_text, job['transcript_segments'] = engine.audio_proc.transcribe_segmented(audio_file)
+            stt_span.set(segments=len(job['transcript_segments']))
+        elif 'audio_data' in job:
+            transcribed_text = engine.audio_proc.recognize(job.pop('audio_data'))
+        else:
+            transcribed_text = engine.audio_proc.transcribe_wav(job['wav_path'], cleanup=job['wav_is_temp'])
+        stt_span.set(chars=len(transcribed_text or ''))
+
     if not transcribed_text:
         logger.warning(f"No transcription available for {audio_file}")
-        return
+        return None
+
+    # An empty question list is checkpointed too, so the file is not retried
+    job['transcript'] = transcribed_text
+    job['questions'] = []
 
     # Check if wake word is present
-    if WAKE_WORD.lower() not in transcribed_text.lower():
-        logger.info(f"Wake word '{WAKE_WORD}' not found in audio file {audio_file}. Skipping processing.")
-        return
+    with span('wake_word') as wake_span:
+        found = engine.wake_word.lower() in transcribed_text.lower()
+        wake_span.set(found=found)
+    if not found:
+        logger.info(f"Wake word '{engine.wake_word}' not found in audio file {audio_file}. Skipping processing.")
+        return None
 
     # Split into questions
-    questions = text_proc.split_questions(transcribed_text)
+    questions = engine.text_proc.split_questions(transcribed_text)
     if not questions:
         logger.info(f"No valid questions found in {audio_file}")
-        return
+        return None
+
+    job['questions'] = questions
+    return job
 
+def answer_job(job, engine):
+    """Generate an LLM answer for every question of a job"""
+    questions = job['questions']
     qa_pairs = []
+    answered = []
     logger.info(f"Found {len(questions)} questions in the audio")
 
-    # Process each question
-    for i, question in enumerate(questions, 1):
-        logger.info(f"Processing question {i}/{len(questions)}: {question}")
-        
-        # Get LLM response
-        logger.info("Generating response from LLM...")
-        response = llm_handler.generate_response(question)
-        
+    logger.info("Generating responses from LLM...")
+    streaming = setting('LLM_TTS_STREAMING', True) and engine.audio_proc.speech_cache is not None
+    conversation_mode = setting('LLM_CONVERSATION_MODE', None)
+    if conversation_mode:
+        # One conversation per recording: questions are asked in turn, and
+        # Ollama only processes what is new in each one
+        conversation = engine.llm_handler.conversation(conversation_mode)
+        if streaming:
+            results = [speak_tagged(idx, question, engine, conversation)
+                       for idx, question in enumerate(questions, 1)]
+        else:
+            results = conversation.answers(questions)
+    elif streaming:
+        # Sentences are rendered into the speech cache while the answer streams,
+        # so the TTS stage later finds most of its audio ready
+        workers = min(len(questions), engine.llm_handler.max_parallel)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='answer') as executor:
+            futures = [executor.submit(bind(speak_tagged), idx, question, engine)
+                       for idx, question in enumerate(questions, 1)]
+            results = [future.result() for future in futures]
+    else:
+        # Ask all questions at once; answers come back in question order
+        results = engine.llm_handler.answers(questions)
+
+    failed = sum(1 for result in results if result.error)
+    if failed:
+        # Saved as usual, but not checkpointed, so the next run asks again
+        logger.warning(f"{failed}/{len(questions)} answers for {job['audio_file']} failed; "
+                       f"it will be processed again on the next run")
+        job['llm_failed'] = True
+
+    responses = [result.error or result.text for result in results]
+    for i, (question, response) in enumerate(zip(questions, responses), 1):
+        logger.info(f"Processed question {i}/{len(questions)}: {question}")
         if response:
             # Format and save Q&A pair
-            qa_pair = text_proc.format_qa_pair(question, response)
+            qa_pair = engine.text_proc.format_qa_pair(question, response)
             qa_pairs.append(qa_pair)
+            answered.append(question)
 
-    if qa_pairs:
-        # Generate timestamp for this conversation
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        
-        # Save conversation text
-        text_filename = f"conversation_{timestamp}.md"
-        file_handler.save_qa_text(qa_pairs, text_filename)
-
-        # Format audio text with proper spacing and punctuation
-        audio_parts = []
-        for q, a in zip(questions, [pair.split('\n')[1][3:] for pair in qa_pairs]):
-            audio_parts.extend([
-                "Question:",
-                q.strip() + ".",  # Ensure question ends with period
-                "Answer:",
-                a.strip() + "."   # Ensure answer ends with period
-            ])
-        
-        full_audio_text = " ".join(audio_parts)
-        logger.info(f"Total response length: {len(full_audio_text.split())} words")
-        
-        # Split into chunks if necessary
-        chunks = chunk_text(full_audio_text)
-        
-        # Process each chunk and keep track of audio files
-        audio_files = []
-        for chunk_idx, chunk in enumerate(chunks, 1):
-            chunk_filename = f"qa_session_{timestamp}_part{chunk_idx}.mp3"
-            audio_path = file_handler.get_audio_path(chunk_filename)
-            logger.info(f"Converting chunk {chunk_idx}/{len(chunks)} to speech ({len(chunk.split())} words)")
-            audio_proc.text_to_speech(chunk, str(audio_path))
-            audio_files.append(chunk_filename)
-        
-        # Save metadata for this conversation
-        file_handler.save_conversation_metadata(
-            original_audio=audio_file,
-            qa_pairs=qa_pairs,
-            audio_files=audio_files,
-            timestamp=timestamp
+    if not qa_pairs:
+        return None
+
+    job['qa_pairs'] = qa_pairs
+    job['answered'] = answered
+    job['timestamp'] = new_timestamp()
+    return job
+
+def speak_answer(question, engine=None, on_audio=None, conversation=None, result=None):
+    """Answer a question, synthesizing each sentence while the rest is generated.
+
+    `on_audio(sentence, mp3_bytes)` is called for every sentence in order as
+    soon as its audio is ready (sentences whose synthesis failed are skipped).
+    Pass an LLMConversation to ask the question as its next turn, and a
+    StreamResult as `result` to learn whether the answer failed. Returns the
+    full answer text.
+    """
+    engine = engine or get_engine()
+    llm = conversation or engine.llm_handler
+    sentences = llm.stream_sentences(question, result=result)
+    spoken = []
+    for sentence, audio in engine.audio_proc.stream_speech(sentences):
+        spoken.append(sentence)
+        if on_audio is not None and audio is not None:
+            on_audio(sentence, audio)
+    return ' '.join(spoken)
+
+def speak_tagged(question_idx, question, engine, conversation=None):
+    """Speak an answer with the question tag; returns its StreamResult"""
+    result = StreamResult()
+    with tagged(question=question_idx):
+        text = speak_answer(question, engine, conversation=conversation, result=result)
+    if not result.error:
+        result.text = text
+    return result
+
+def synthesize_job(job, engine):
+    """Convert the Q&A pairs of a job into audio chunk files"""
+    timestamp = job['timestamp']
+    answers = [pair.split('\n')[1][3:] for pair in job['qa_pairs']]
+
+    if engine.audio_proc.output_encoder is not None:
+        return synthesize_conversation(job, engine, answers)
+
+    # Format audio text with proper spacing and punctuation
+    audio_parts = []
+    for q, a in zip(job['answered'], answers):
+        audio_parts.extend([
+            "Question:",
+            end_sentence(q),
+            "Answer:",
+            # Same sentences as the streamed answer, so its cached audio is reused
+            end_sentence(a)
+        ])
+    
+    full_audio_text = " ".join(audio_parts)
+    logger.info(f"Total response length: {len(full_audio_text.split())} words")
+    
+    # Split into chunks if necessary
+    chunks = chunk_text(full_audio_text)
+    
+    # Process each chunk and keep track of audio files
+    audio_files = []
+    for chunk_idx, chunk in enumerate(chunks, 1):
+        chunk_filename = f"qa_session_{timestamp}_part{chunk_idx}.mp3"
+        audio_path = engine.file_handler.get_audio_path(chunk_filename)
+        logger.info(f"Converting chunk {chunk_idx}/{len(chunks)} to speech ({len(chunk.split())} words)")
+        with span('tts_chunk', chunk=chunk_idx, words=len(chunk.split())) as chunk_span:
+            spoken = engine.audio_proc.text_to_speech(chunk, str(audio_path))
+            written = audio_path.stat().st_size if audio_path.exists() else 0
+            chunk_span.set(bytes=written)
+        metrics.inc('jarvis_tts_bytes_total', written)
+        if not spoken:
+            return tts_failed(job)
+        audio_files.append(chunk_filename)
+
+    job['audio_files'] = audio_files
+    return job
+
+def synthesize_conversation(job, engine, answers):
+    """Speak a job's Q&A pairs into a single audio file with a chapter per turn"""
+    encoder = engine.audio_proc.output_encoder
+    turns = []
+    for idx, (q, a) in enumerate(zip(job['answered'], answers), 1):
+        turns.append((f"Question {idx}", f"Question: {end_sentence(q)}"))
+        turns.append((f"Answer {idx}", f"Answer: {end_sentence(a)}"))
+    logger.info(f"Total response length: {sum(len(text.split()) for _, text in turns)} words")
+
+    filename = f"qa_session_{job['timestamp']}{encoder.extension}"
+    audio_path = engine.file_handler.get_audio_path(filename)
+    with span('tts_render', turns=len(turns), format=encoder.audio_format) as render_span:
+        chapters = engine.audio_proc.render_conversation(turns, str(audio_path))
+        written = audio_path.stat().st_size if chapters is not None and audio_path.exists() else 0
+        render_span.set(bytes=written)
+    metrics.inc('jarvis_tts_bytes_total', written)
+
+    if chapters is None:
+        return tts_failed(job)
+    job['audio_files'] = [filename]
+    job['chapters'] = chapters
+    return job
+
+def tts_failed(job):
+    """Leave the audio unset so the next run synthesizes it again"""
+    # The text is still saved, but neither tts nor persist is checkpointed
+    logger.warning(f"Speech synthesis for {job['audio_file']} failed; "
+                   f"it will be processed again on the next run")
+    job['tts_failed'] = True
+    return job
+
+def retry_next_run(job):
+    """True if an answer or its audio failed, so the job must not be checkpointed"""
+    return job.get('llm_failed') or job.get('tts_failed')
+
+def persist_job(job, engine):
+    """Save the conversation text and metadata of a job
+
+    With the background writer the files are written off this thread; the
+    job is checkpointed as persisted once the write has succeeded.
+    """
+    timestamp = job['timestamp']
+    text_filename = f"conversation_{timestamp}.md"
+
+    if engine.persistence is not None:
+        future = engine.persistence.submit(
+            original_audio=job['audio_file'],
+            qa_pairs=job['qa_pairs'],
+            audio_files=job.get('audio_files', []),
+            timestamp=timestamp,
+            chapters=job.get('chapters')
         )
-        
-        logger.info(f"Completed processing {audio_file} - Generated {len(chunks)} audio files")
-        logger.info(f"Conversation saved in resources/output/text/{text_filename}")
-        logger.info(f"Audio files saved in resources/output/audio/")
+        future.add_done_callback(lambda done: persisted(job, engine, done.exception()))
+        return job
+
+    # Save conversation text
+    engine.file_handler.save_qa_text(job['qa_pairs'], text_filename)
+
+    # Save metadata for this conversation
+    engine.file_handler.save_conversation_metadata(
+        original_audio=job['audio_file'],
+        qa_pairs=job['qa_pairs'],
+        audio_files=job.get('audio_files', []),
+        timestamp=timestamp,
+        chapters=job.get('chapters')
+    )
+    job['persisted'] = True
+    log_persisted(job)
+    return job
+
+def persisted(job, engine, error):
+    """Completion callback of a background write (runs on the writer thread)"""
+    if error is not None:
+        logger.error(f"Failed to save the conversation of {job['audio_file']}: {error}")
+        metrics.inc('jarvis_persist_errors_total')
+        return
+    if engine.manifest is not None and 'content_hash' in job and not retry_next_run(job):
+        engine.manifest.checkpoint(job['content_hash'], job['audio_file'], 'persist', {'persisted': True})
+    log_persisted(job)
+
+def log_persisted(job):
+    logger.info(f"Completed processing {job['audio_file']} - Generated {len(job.get('audio_files', []))} audio files")
+    logger.info(f"Conversation saved in resources/output/text/conversation_{job['timestamp']}.md")
+    logger.info(f"Audio files saved in resources/output/audio/")
+
+# Stage name -> (job key that marks the stage as done, job keys it checkpoints)
+CHECKPOINTS = {
+    'transcribe': ('questions', ('transcript', 'transcript_segments', 'questions')),
+    'llm': ('qa_pairs', ('qa_pairs', 'answered', 'timestamp')),
+    'tts': ('audio_files', ('audio_files', 'chapters')),
+    'persist': ('persisted', ('persisted',)),
+}
+
+def checkpointed(stage, step, engine):
+    """Wrap a step so it is skipped if already done and its output is recorded"""
+    done_key, saved_keys = CHECKPOINTS[stage]
+
+    def run(job):
+        for record in job.pop('pending_spans', ()):
+            tracer.emit(record)
+        if done_key in job:
+            return job
+        with tagged(file=job['audio_file']), span(stage):
+            result = step(job, engine)
+        # After a failed answer or audio nothing more is checkpointed, so the file is retried
+        if engine.manifest is not None and 'content_hash' in job and not retry_next_run(job):
+            fields = {key: job[key] for key in saved_keys if key in job}
+            if fields:
+                engine.manifest.checkpoint(job['content_hash'], job['audio_file'], stage, fields)
+        return result
+    return run
+
+def new_job(audio_file, engine=None):
+    """Create the work item for a file, resuming from the manifest if possible"""
+    job = {'audio_file': audio_file}
+    manifest = engine.manifest if engine is not None else None
+    if manifest is None:
+        return job
+
+    job['content_hash'] = manifest.hash_file(engine.audio_proc.input_dir / audio_file)
+    state = manifest.load(job['content_hash'])
+    if state.get('persisted') or state.get('questions') == []:
+        logger.info(f"Skipping {audio_file}: already processed")
+        return None
+    if state:
+        logger.info(f"Resuming {audio_file} after checkpoint(s): {', '.join(sorted(state))}")
+    job.update(state)
+    return job
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Return the shared processing engine, creating it on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            from src.engine import JarvisEngine
+            _engine = JarvisEngine(setting('WAKE_WORD', 'jarvis'))
+        return _engine
+
+def build_steps(engine):
+    """Processing steps shared by the sequential path and the pipeline"""
+    return [
+        ('transcribe', checkpointed('transcribe', transcribe_job, engine)),
+        ('llm', checkpointed('llm', answer_job, engine)),
+        ('tts', checkpointed('tts', synthesize_job, engine)),
+        ('persist', checkpointed('persist', persist_job, engine)),
+    ]
+
+def process_audio_file(audio_file, engine=None):
+    engine = engine or get_engine()
+
+    job = new_job(audio_file, engine)
+    if job:
+        job = decode_job(job, engine.audio_proc)
+    for _, step in build_steps(engine):
+        if not job:
+            return None
+        job = step(job)
+    return job
+
+def build_pipeline(engine=None):
+    """Create the staged batch pipeline: decode -> transcribe -> LLM -> TTS -> persist"""
+    engine = engine or get_engine()
+    workers = dict(DEFAULT_PIPELINE_WORKERS, **setting('PIPELINE_WORKERS', {}))
+    queue_size = setting('PIPELINE_QUEUE_SIZE', 8)
+
+    stages = [Stage('decode', decode_job, workers['decode'], queue_size, use_processes=True)]
+    for name, step in build_steps(engine):
+        stages.append(Stage(name, step, workers[name], queue_size))
+    return Pipeline(stages)
+
+def watch(engine=None):
+    """Process new audio files as they appear until interrupted"""
+    from src.watcher import DirectoryWatcher, WatchDaemon
+    engine = engine or get_engine()
+    watcher = DirectoryWatcher(
+        'resources/input',
+        stable_seconds=setting('WATCH_STABLE_SECONDS', 2.0),
+        poll_interval=setting('WATCH_POLL_INTERVAL', 2.0),
+    )
+    daemon = WatchDaemon(
+        watcher,
+        lambda audio_file: process_audio_file(audio_file, engine),
+        workers=setting('WATCH_WORKERS', 2),
+        queue_size=setting('WATCH_QUEUE_SIZE', 16),
+    )
+    daemon.run()
+
+def prepare_run():
+    """Validate the config and set up directories, logging and metrics; returns the metrics flush"""
+    problems = validate_settings()
+    if problems:
+        print("❌ Invalid configuration:\n  " + "\n  ".join(problems))
+        return None
 
-def main():
     # Create required directories
     for dir_path in ['resources/input', 'resources/output/text', 'resources/output/audio', 'resources/temp']:
         Path(dir_path).mkdir(parents=True, exist_ok=True)
-    
+    setup_logging()
+
+    return configure_metrics(
+        trace_file=setting('TRACE_FILE', 'resources/output/trace.jsonl'),
+        metrics_file=setting('METRICS_FILE', 'resources/output/metrics.prom'),
+        metrics_port=setting('METRICS_PORT', None),
+        write_interval=setting('METRICS_WRITE_INTERVAL', 15.0),
+    )
+
+def process_command(args):
+    """Process every recording in the input directory"""
+    flush_metrics = prepare_run()
+    if flush_metrics is None:
+        return 2
+
     input_dir = Path('resources/input')
     logger.info(f"Watching for audio files in: {input_dir}")
-    
+
     # Process all audio files in input directory
     audio_files = list(input_dir.glob('*.m4a'))
     logger.info(f"Found {len(audio_files)} .m4a files to process")
-    
-    for audio_file in audio_files:
-        logger.info(f"Processing audio file: {audio_file.name}")
-        process_audio_file(audio_file.name)
+    if not audio_files:
+        return 0
+
+    engine = get_engine()
+    try:
+        if setting('PIPELINE_ENABLED', True) and len(audio_files) > 1:
+            jobs = (new_job(audio_file.name, engine) for audio_file in audio_files)
+            results = build_pipeline(engine).run(job for job in jobs if job)
+            logger.info(f"Pipeline finished: {len(results)}/{len(audio_files)} files produced conversations")
+            return 0
+
+        for audio_file in audio_files:
+            logger.info(f"Processing audio file: {audio_file.name}")
+            process_audio_file(audio_file.name, engine)
+        return 0
+    finally:
+        engine.close()
+        flush_metrics()
+
+def watch_command(args):
+    """Keep processing recordings as they arrive"""
+    flush_metrics = prepare_run()
+    if flush_metrics is None:
+        return 2
+    engine = get_engine()
+    try:
+        watch(engine)
+    finally:
+        engine.close()
+        flush_metrics()
+    return 0
+
+def list_command(args):
+    """List or search saved conversations (only needs SQLite, so it starts fast)"""
+    from src.conversation_store import (ConversationStore, format_conversation, format_hit,
+                                        read_metadata)
+    store_path = Path(setting('CONVERSATION_STORE_PATH', 'resources/output/conversations.sqlite3'))
+    if setting('CONVERSATION_STORE_ENABLED', True) and store_path.exists():
+        store = ConversationStore(store_path)
+        if args.search:
+            lines = [format_hit(hit) for hit in store.search(args.search, args.limit)]
+        else:
+            lines = [format_conversation(c) for c in store.list(args.limit, args.before)]
+    elif args.search:
+        print("❌ Searching needs the conversation store (CONVERSATION_STORE_ENABLED)")
+        return 1
+    else:
+        conversations = sorted(read_metadata('resources/output/text'), key=lambda c: c['timestamp'], reverse=True)
+        if args.before:
+            conversations = [c for c in conversations if c['timestamp'] < args.before]
+        lines = [format_conversation(c) for c in conversations[:args.limit]]
+    if lines:
+        print('\n'.join(lines))
+    return 0
+
+def bench_command(args):
+    """Run the offline benchmark (in its own process: it brings its own config)"""
+    import subprocess
+    argv = args.bench_args[1:] if args.bench_args[:1] == ['--'] else args.bench_args
+    repo_root = Path(__file__).resolve().parent
+    return subprocess.call([sys.executable, '-m', 'benchmarks.run_benchmark', *argv], cwd=repo_root)
+
+def doctor_command(args):
+    """Check the configuration, dependencies and Ollama servers"""
+    import importlib.util
+    import shutil
+    failed = False
+
+    def report(ok, message, warn_only=False):
+        nonlocal failed
+        if ok:
+            print(f"✅ {message}")
+        elif warn_only:
+            print(f"⚠️  {message}")
+        else:
+            print(f"❌ {message}")
+            failed = True
+
+    problems = validate_settings()
+    report(not problems, "Configuration" + ("" if not problems else ":\n     " + "\n     ".join(problems)))
+
+    for module, package, required in [
+        ('speech_recognition', 'SpeechRecognition', True), ('gtts', 'gTTS', True),
+        ('pydub', 'pydub', True), ('requests', 'requests', True), ('numpy', 'numpy', True),
+        ('orjson', 'orjson (faster LLM stream decoding)', False),
+        ('vosk', 'vosk (STT_BACKEND "vosk" / local wake word)', False),
+        ('pocketsphinx', 'pocketsphinx (STT_BACKEND "sphinx")', False),
+    ]:
+        found = importlib.util.find_spec(module) is not None
+        report(found, f"{package} {'installed' if found else 'not installed'}", warn_only=not required)
+
+    report(shutil.which('ffmpeg') is not None, "FFmpeg " + ("found" if shutil.which('ffmpeg') else
+           "not found (needed to decode .m4a input and for Opus output)"))
+
+    for dir_path in ['resources/input', 'resources/output']:
+        path = Path(dir_path)
+        try:
+            path.mkdir(parents=True, exist_ok=True)
+            probe = path / '.doctor'
+            probe.write_bytes(b'')
+            probe.unlink()
+            report(True, f"{dir_path} is writable")
+        except OSError as e:
+            report(False, f"{dir_path} is not writable: {e}")
+
+    if config_loaded() and importlib.util.find_spec('requests') is not None:
+        import requests
+        from urllib.parse import urlsplit
+        parts = urlsplit(setting('OLLAMA_API_URL', 'http://127.0.0.1:11434/api/generate'))
+        model = setting('MODEL_NAME')
+        for base_url in setting('OLLAMA_ENDPOINTS', None) or [f"{parts.scheme}://{parts.netloc}"]:
+            try:
+                response = requests.get(base_url.rstrip('/') + '/api/tags', timeout=3)
+                response.raise_for_status()
+                models = [entry.get('name') for entry in response.json().get('models', [])]
+            except (requests.exceptions.RequestException, ValueError) as e:
+                report(False, f"Ollama at {base_url} is not reachable: {e}")
+                continue
+            has_model = model in models or f"{model}:latest" in models
+            report(has_model, f"Ollama at {base_url} " + (f"has {model}" if has_model else
+                   f"doesn't have {model} (run: ollama pull {model})"))
+    return 1 if failed else 0
+
+COMMANDS = {
+    'process': process_command,
+    'watch': watch_command,
+    'list': list_command,
+    'bench': bench_command,
+    'doctor': doctor_command,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Jarvis voice assistant")
+    parser.add_argument('--watch', action='store_true',
+                        help="same as the watch command")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.add_parser('process', help="process the recordings in resources/input (default)")
+    commands.add_parser('watch', help="keep running and process new files as they arrive")
+    list_cmd = commands.add_parser('list', help="list saved conversations, newest first")
+    list_cmd.add_argument('--limit', type=int, default=20)
+    list_cmd.add_argument('--before', help="timestamp of the last conversation of the previous page")
+    list_cmd.add_argument('--search', help="full-text search over questions and answers instead")
+    bench_cmd = commands.add_parser('bench', help="run the offline benchmark (see benchmarks/)",
+                                    add_help=False)
+    bench_cmd.add_argument('bench_args', nargs=argparse.REMAINDER)
+    commands.add_parser('doctor', help="check the configuration, dependencies and Ollama")
+    args = parser.parse_args(argv)
+
+    command = args.command or ('watch' if args.watch else 'process')
+    return COMMANDS[command](args)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
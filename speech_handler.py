@@ -1,25 +1,41 @@
 import speech_recognition as sr
 from gtts import gTTS
-from playsound import playsound
-import os
+from pydub import AudioSegment
+from pydub.playback import play
+from io import BytesIO
+import config
 from config import LANGUAGE, RATE, VOLUME, VOICE_ID, WAKE_WORD
+from src.stt_backends import create_backend
+from src.segmenter import SilenceSegmenter
+from src.wake_word import WakeWordDetector
 
 class SpeechHandler:
     def __init__(self):
         # Initialize speech recognizer
         self.recognizer = sr.Recognizer()
-        
-        # Create temp directory for audio files if it doesn't exist
-        self.temp_dir = "temp"
-        if not os.path.exists(self.temp_dir):
-            os.makedirs(self.temp_dir)
+        self.stt_backend = create_backend(
+            getattr(config, 'STT_BACKEND', 'google'),
+            language=LANGUAGE,
+            **getattr(config, 'STT_OPTIONS', {})
+        )
+        self.wake_detector = None
+        if getattr(config, 'WAKE_WORD_ENGINE', 'auto'):
+            self.wake_detector = WakeWordDetector(
+                WAKE_WORD,
+                engine=getattr(config, 'WAKE_WORD_ENGINE', 'auto'),
+                model_path=getattr(config, 'WAKE_WORD_MODEL_PATH', None),
+                sensitivity=getattr(config, 'WAKE_WORD_SENSITIVITY', 0.85),
+            )
+        self._calibrated = False
 
     def listen(self):
         """Listen for user input and return the recognized text"""
         with sr.Microphone() as source:
             print("\n🎤 Listening... (Speak now)")
-            # Adjust for ambient noise and increase dynamic energy threshold
-            self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+            # Adjust for ambient noise once and increase dynamic energy threshold
+            if not self._calibrated:
+                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+                self._calibrated = True
             self.recognizer.dynamic_energy_threshold = True
             self.recognizer.energy_threshold = 4000  # Increase if needed
             
@@ -28,7 +44,7 @@ class SpeechHandler:
                 audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=10)
                 print("🔍 Processing your speech...")
                 
-                text = self.recognizer.recognize_google(audio, language=LANGUAGE)
+                text = self.stt_backend.transcribe(audio).text
                 print(f"\n👥 You said: {text}")
                 return text.lower()
                     
@@ -42,23 +58,57 @@ class SpeechHandler:
                 print(f"🚫 Error with the speech service; {e}")
                 return None
 
+    def listen_continuous(self, stop_event=None):
+        """Keep the microphone open and yield utterances that contain the wake word.
+
+        The noise level is calibrated once. Frames below the energy threshold
+        never leave this loop, a ring buffer keeps the start of each
+        utterance, and utterances are checked for the wake word locally
+        (when an offline engine is available) before any full transcription.
+        """
+        segmenter = SilenceSegmenter(
+            min_silence_ms=getattr(config, 'LISTEN_PAUSE_MS', 800),
+            max_segment_s=getattr(config, 'LISTEN_PHRASE_LIMIT', 10),
+            padding_ms=300,
+        )
+        with sr.Microphone(sample_rate=segmenter.sample_rate) as source:
+            print("\n🎤 Calibrating microphone...")
+            self.recognizer.adjust_for_ambient_noise(source, duration=1)
+            segmenter.energy_threshold = self.recognizer.energy_threshold * 1.5
+            frames_per_read = segmenter.frame_bytes // source.SAMPLE_WIDTH
+            print("🎤 Listening continuously... (say the wake word)")
+
+            def frames():
+                while stop_event is None or not stop_event.is_set():
+                    yield source.stream.read(frames_per_read)
+
+            for _, _, pcm in segmenter.segments(frames()):
+                audio = sr.AudioData(pcm, segmenter.sample_rate, segmenter.sample_width)
+                if self.wake_detector is not None and self.wake_detector.detect(audio) is False:
+                    continue
+                try:
+                    text = self.stt_backend.transcribe(audio).text
+                except sr.UnknownValueError:
+                    continue
+                except sr.RequestError as e:
+                    print(f"🚫 Error with the speech service; {e}")
+                    continue
+                if self.is_wake_word(text):
+                    print(f"\n👥 You said: {text}")
+                    yield text.lower()
+
     def speak(self, text):
-        """Convert text to speech"""
+        """Convert text to speech and play it from memory"""
         print(f"\n🤖 Assistant: {text}")
         try:
             print("🔊 Generating speech...")
             # Create gTTS object
             tts = gTTS(text=text, lang=LANGUAGE.split('-')[0])
-            # Save to temporary file
-            temp_file = os.path.join(self.temp_dir, "temp.mp3")
-            tts.save(temp_file)
-            # Play the audio
-            playsound(temp_file)
-            # Clean up
-            try:
-                os.remove(temp_file)
-            except:
-                pass
+            buffer = BytesIO()
+            tts.write_to_fp(buffer)
+            buffer.seek(0)
+            # Play the audio without writing it to disk
+            play(AudioSegment.from_file(buffer, format="mp3"))
         except Exception as e:
             print(f"🚫 Error in speech synthesis: {e}")
 
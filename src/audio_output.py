@@ -0,0 +1,185 @@
+"""Assemble the spoken turns of a conversation into a single audio file.
+
+TTS backends return MP3 segments. Instead of writing (and re-fetching) one
+file per chunk, the segments of all turns are joined in memory at MP3 frame
+level with silent frames between turns. The result is encoded at most once:
+as is when plain MP3 is wanted, or in a single ffmpeg pass to a compact
+format such as low-bitrate Opus. Frame headers give exact timings, so a
+chapter index (start/end of every turn) comes for free.
+"""
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# kbit/s by bitrate index: MPEG-1 layers I-III, then MPEG-2/2.5 layer I and layers II/III
+_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# Sample rates by version bits (0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1)
+_SAMPLE_RATES = {0: [11025, 12000, 8000], 2: [22050, 24000, 16000], 3: [44100, 48000, 32000]}
+
+
+class MP3Frame:
+    """Header fields of one MPEG audio frame"""
+
+    def __init__(self, header, offset):
+        self.header = header
+        self.offset = offset
+        version_bits = (header[1] >> 3) & 3
+        self.mpeg1 = version_bits == 3
+        self.layer = 4 - ((header[1] >> 1) & 3)
+        self.crc = not header[1] & 1
+        self.sample_rate = _SAMPLE_RATES[version_bits][(header[2] >> 2) & 3]
+        bitrate = _BITRATES[(1 if self.mpeg1 else 2, self.layer)][header[2] >> 4] * 1000
+        padding = (header[2] >> 1) & 1
+        self.mono = header[3] >> 6 == 3
+        if self.layer == 1:
+            self.samples = 384
+            self.length = (12 * bitrate // self.sample_rate + padding) * 4
+        else:
+            self.samples = 1152 if self.mpeg1 or self.layer == 2 else 576
+            self.length = self.samples // 8 * bitrate // self.sample_rate + padding
+
+    @property
+    def duration(self):
+        return self.samples / self.sample_rate
+
+    @staticmethod
+    def valid(header):
+        return (len(header) == 4 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0
+                and (header[1] >> 3) & 3 != 1 and (header[1] >> 1) & 3 != 0
+                and header[2] >> 4 not in (0, 15) and (header[2] >> 2) & 3 != 3)
+
+    def is_info(self, data):
+        """Xing/Info/VBRI header frames carry metadata rather than audio"""
+        side_info = (17 if self.mono else 32) if self.mpeg1 else (9 if self.mono else 17)
+        start = self.offset + 4 + (2 if self.crc else 0) + side_info
+        return data[start:start + 4] in (b'Xing', b'Info') or data[self.offset + 36:self.offset + 40] == b'VBRI'
+
+
+def mp3_frames(data):
+    """Yield the audio frames of an MP3 byte string, skipping tags and junk"""
+    pos = 0
+    if data[:3] == b'ID3' and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        pos = 10 + size + (10 if data[5] & 0x10 else 0)
+    end = len(data)
+    while pos + 4 <= end:
+        header = data[pos:pos + 4]
+        if not MP3Frame.valid(header):
+            pos += 1
+            continue
+        frame = MP3Frame(header, pos)
+        if frame.length < 4 or pos + frame.length > end:
+            pos += 1
+            continue
+        if not frame.is_info(data):
+            yield frame
+        pos += frame.length
+
+
+def silent_frames(reference, seconds):
+    """MP3 frames of silence matching the format of `reference` (an MP3Frame).
+
+    Returns the frames and their exact duration.
+    """
+    header = bytearray(reference.header)
+    header[1] |= 1      # no CRC
+    header[2] &= ~0x02  # no padding
+    frame = MP3Frame(bytes(header), 0)
+    count = max(0, round(seconds / frame.duration))
+    # All-zero side info and main data decode as silence
+    silence = bytes(header) + b'\0' * (frame.length - 4)
+    return silence * count, count * frame.duration
+
+
+class ConversationEncoder:
+    """Join the audio of a conversation's turns into one file.
+
+    `audio_format` is "mp3" or "opus". MP3 without a `bitrate` is written
+    from the TTS frames as they are (no re-encoding); anything else is
+    encoded once with ffmpeg. Without ffmpeg, plain MP3 is written instead.
+    """
+
+    CODECS = {
+        'mp3': ('libmp3lame', 'mp3', '.mp3'),
+        'opus': ('libopus', 'ogg', '.opus'),
+    }
+
+    def __init__(self, audio_format='mp3', bitrate=None, turn_gap=0.6, converter='ffmpeg'):
+        if audio_format not in self.CODECS:
+            raise ValueError(f"Unknown audio output format '{audio_format}'. "
+                             f"Available: {', '.join(self.CODECS)}")
+        self.audio_format = audio_format
+        self.bitrate = bitrate or ('24k' if audio_format == 'opus' else None)
+        self.turn_gap = turn_gap
+        self.converter = shutil.which(converter) if converter else None
+        if self.transcode and self.converter is None:
+            logger.warning(f"ffmpeg not found; writing conversation audio as MP3 instead of "
+                           f"{audio_format} {self.bitrate or ''}".rstrip())
+            self.audio_format, self.bitrate = 'mp3', None
+
+    @property
+    def transcode(self):
+        return self.audio_format != 'mp3' or self.bitrate is not None
+
+    @property
+    def extension(self):
+        return self.CODECS[self.audio_format][2]
+
+    def assemble(self, turns):
+        """Join `turns` ([(title, [mp3 segment bytes, ...]), ...]) into one MP3 stream.
+
+        Returns the MP3 bytes and the chapter index: one
+        {"title", "start", "end"} dict per turn, in seconds.
+        """
+        stream = bytearray()
+        chapters = []
+        position = 0.0
+        reference = None
+        for title, segments in turns:
+            if chapters and reference is not None and self.turn_gap:
+                gap, gap_duration = silent_frames(reference, self.turn_gap)
+                stream += gap
+                position += gap_duration
+            start = position
+            for data in segments:
+                for frame in mp3_frames(data):
+                    stream += data[frame.offset:frame.offset + frame.length]
+                    position += frame.duration
+                    reference = frame
+            chapters.append({"title": title, "start": round(start, 3), "end": round(position, 3)})
+        return bytes(stream), chapters
+
+    def encode(self, turns, output_path):
+        """Write the conversation audio to `output_path` and return the chapters"""
+        data, chapters = self.assemble(turns)
+        output_path = Path(output_path)
+        fd, tmp_path = tempfile.mkstemp(dir=output_path.parent, suffix=output_path.suffix)
+        try:
+            if self.transcode:
+                os.close(fd)
+                codec, container, _ = self.CODECS[self.audio_format]
+                command = [self.converter, '-v', 'error', '-f', 'mp3', '-i', 'pipe:0',
+                           '-ac', '1', '-c:a', codec, '-b:a', self.bitrate, '-f', container, '-y', tmp_path]
+                subprocess.run(command, input=data, check=True, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE)
+            else:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return chapters
@@ -3,15 +3,47 @@ from gtts import gTTS
 import os
 from pathlib import Path
 import logging
+import queue
+import subprocess
+import threading
+import wave
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pydub import AudioSegment
 import tempfile
+from src.metrics import bind
+from src.segmenter import SilenceSegmenter
+from src.single_flight import SingleFlight
+from src.stt_backends import GoogleBackend
+from src.text_processor import split_sentences
+
+# Recognition input format: 16 kHz, mono, 16-bit PCM
+RECOGNITION_SAMPLE_RATE = 16000
+RECOGNITION_SAMPLE_WIDTH = 2
+
+def gtts_synthesize(text, lang='en'):
+    """Synthesize text with Google TTS and return the MP3 bytes"""
+    buffer = BytesIO()
+    gTTS(text=text, lang=lang).write_to_fp(buffer)
+    return buffer.getvalue()
 
 class AudioProcessor:
-    def __init__(self, input_dir, output_dir, temp_dir):
+    def __init__(self, input_dir, output_dir, temp_dir, speech_cache=None, tts_parallel=4,
+                 segmenter=None, stt_parallel=4, stt_backend=None, tts_backend=None, output_encoder=None,
+                 coalesce=True):
         self.recognizer = sr.Recognizer()
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.temp_dir = Path(temp_dir)
+        self.speech_cache = speech_cache
+        self.tts_parallel = max(1, tts_parallel)
+        self.segmenter = segmenter
+        self.stt_parallel = max(1, stt_parallel)
+        self.stt_backend = stt_backend or GoogleBackend()
+        self.tts_backend = tts_backend or gtts_synthesize
+        self.output_encoder = output_encoder
+        # Segments being synthesized right now, shared by concurrent jobs
+        self.inflight = SingleFlight('tts') if coalesce else None
         self._setup_directories()
         self._setup_logging()
 
@@ -48,38 +80,68 @@ class AudioProcessor:
             self.logger.error(f"Error converting M4A to WAV: {e}")
             return None
 
-    def transcribe_audio(self, audio_file):
-        """Transcribe audio file to text"""
+    def decode_audio(self, audio_file):
+        """Decode an input file into a WAV path ready for recognition"""
+        input_path = self.input_dir / audio_file
+        if not input_path.exists():
+            self.logger.error(f"Audio file not found: {input_path}")
+            return None
+
+        # Convert M4A to WAV if necessary
+        if input_path.suffix.lower() == '.m4a':
+            return self._convert_m4a_to_wav(input_path)
+        return str(input_path)
+
+    def decode_audio_data(self, audio_file):
+        """Decode an input file straight into in-memory 16 kHz mono audio
+
+        ffmpeg downmixes and resamples while decoding and pipes out raw PCM,
+        so no WAV file is written and the payload sent for recognition is as
+        small as possible. WAV files already in that format are read as is.
+        """
         input_path = self.input_dir / audio_file
-        self.logger.info(f"Starting transcription of: {audio_file}")
-        
         if not input_path.exists():
             self.logger.error(f"Audio file not found: {input_path}")
             return None
 
         try:
-            # Convert M4A to WAV if necessary
-            if input_path.suffix.lower() == '.m4a':
-                wav_path = self._convert_m4a_to_wav(input_path)
-                if not wav_path:
+            self.logger.info(f"Decoding {input_path.name} in memory...")
+            pcm = self._read_recognition_wav(input_path)
+            if pcm is None:
+                command = [
+                    AudioSegment.converter, '-v', 'error', '-i', str(input_path),
+                    '-f', 's16le', '-ac', '1', '-ar', str(RECOGNITION_SAMPLE_RATE), '-',
+                ]
+                pcm = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+            return sr.AudioData(pcm, RECOGNITION_SAMPLE_RATE, RECOGNITION_SAMPLE_WIDTH)
+        except subprocess.CalledProcessError as e:
+            self.logger.error(f"Error decoding {input_path.name}: {e.stderr.decode(errors='replace').strip()}")
+            return None
+        except Exception as e:
+            self.logger.error(f"Error decoding {input_path.name}: {e}")
+            return None
+
+    @staticmethod
+    def _read_recognition_wav(path):
+        """PCM of a WAV file that is already 16 kHz mono 16-bit, otherwise None"""
+        if path.suffix.lower() != '.wav':
+            return None
+        try:
+            with wave.open(str(path), 'rb') as f:
+                if (f.getnchannels(), f.getframerate(), f.getsampwidth()) != (
+                        1, RECOGNITION_SAMPLE_RATE, RECOGNITION_SAMPLE_WIDTH):
                     return None
-            else:
-                wav_path = str(input_path)
+                return f.readframes(f.getnframes())
+        except (wave.Error, EOFError):
+            return None
 
-            with sr.AudioFile(wav_path) as source:
-                self.logger.info("Recording audio from file...")
-                audio = self.recognizer.record(source)
-                
-                self.logger.info("Performing speech recognition...")
-                text = self.recognizer.recognize_google(audio)
-                self.logger.info(f"Successfully transcribed text: {text}")
-                
-                # Clean up temporary WAV file if it was created
-                if input_path.suffix.lower() == '.m4a':
-                    os.unlink(wav_path)
-                    self.logger.info("Cleaned up temporary WAV file")
-                
-                return text
+    def recognize_result(self, audio, start=None, end=None):
+        """Run speech recognition on in-memory audio and return a TranscriptionResult"""
+        try:
+            self.logger.info(f"Performing speech recognition ({self.stt_backend.name})...")
+            result = self.stt_backend.transcribe(audio, start=start, end=end)
+            self.logger.info(f"Successfully transcribed text: {result.text}")
+            return result
 
         except sr.UnknownValueError:
             self.logger.error("Speech recognition could not understand the audio")
@@ -91,15 +153,215 @@ class AudioProcessor:
             self.logger.error(f"Unexpected error during transcription: {e}")
             return None
 
-    def text_to_speech(self, text, output_file):
-        """Convert text to speech and save as audio file"""
+    def transcribe_wav(self, wav_path, cleanup=False):
+        """Transcribe a decoded WAV file, optionally removing it afterwards"""
+        try:
+            with sr.AudioFile(wav_path) as source:
+                self.logger.info("Recording audio from file...")
+                audio = self.recognizer.record(source)
+        except Exception as e:
+            self.logger.error(f"Unexpected error during transcription: {e}")
+            return None
+        finally:
+            # Clean up temporary WAV file if it was created
+            if cleanup and os.path.exists(wav_path):
+                os.unlink(wav_path)
+                self.logger.info("Cleaned up temporary WAV file")
+        return self.recognize(audio)
+
+    def recognize(self, audio):
+        """Run speech recognition on in-memory audio"""
+        result = self.recognize_result(audio)
+        return result.text if result else None
+
+    def stream_pcm(self, audio_file, frame_bytes):
+        """Stream-decode a file into fixed-size 16 kHz mono PCM frames via ffmpeg"""
+        input_path = self.input_dir / audio_file
+        command = [
+            AudioSegment.converter, '-v', 'error', '-i', str(input_path),
+            '-f', 's16le', '-ac', '1', '-ar', str(RECOGNITION_SAMPLE_RATE), '-',
+        ]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                frame = process.stdout.read(frame_bytes)
+                if len(frame) < frame_bytes:
+                    # Pad the final partial frame so every frame has the same size
+                    if frame:
+                        yield frame + b'\0' * (frame_bytes - len(frame))
+                    break
+                yield frame
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            if process.wait() not in (0, -9):
+                self.logger.error(f"ffmpeg failed to decode {input_path.name}")
+
+    def transcribe_segmented(self, audio_file):
+        """Transcribe a long file segment by segment.
+
+        The file is streamed from ffmpeg, cut at pauses by the segmenter and
+        the segments are recognized concurrently. Only a bounded number of
+        segments is held in memory at a time. Returns the stitched text and a
+        list of {start, end, text} dicts in recording order.
+        """
+        segmenter = self.segmenter
+        if segmenter is None:
+            segmenter = SilenceSegmenter(RECOGNITION_SAMPLE_RATE, RECOGNITION_SAMPLE_WIDTH)
+
+        self.logger.info(f"Starting segmented transcription of: {audio_file}")
+        results = []
+        with ThreadPoolExecutor(max_workers=self.stt_parallel, thread_name_prefix='stt') as executor:
+            pending = set()
+            frames = self.stream_pcm(audio_file, segmenter.frame_bytes)
+            for start, end, pcm in segmenter.segments(frames):
+                audio = sr.AudioData(pcm, segmenter.sample_rate, segmenter.sample_width)
+                future = executor.submit(self.recognize_result, audio, start, end)
+                results.append((start, end, future))
+                pending.add(future)
+                # Backpressure: stop decoding while enough segments are queued
+                if len(pending) >= self.stt_parallel * 2:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+        segments = []
+        for start, end, future in results:
+            result = future.result()
+            if result:
+                segments.append({
+                    "start": round(start, 2),
+                    "end": round(end, 2),
+                    "text": result.text,
+                    "confidence": result.confidence,
+                })
+        self.logger.info(f"Transcribed {len(segments)}/{len(results)} speech segments")
+        if not segments:
+            return None, []
+        return " ".join(segment["text"] for segment in segments), segments
+
+    def transcribe_audio(self, audio_file):
+        """Transcribe audio file to text"""
+        self.logger.info(f"Starting transcription of: {audio_file}")
+        audio = self.decode_audio_data(audio_file)
+        if audio is None:
+            return None
+        return self.recognize(audio)
+
+    def _resolve_output(self, output_file):
+        """Bare file names go to the output directory; other paths are used as given"""
+        output_path = Path(output_file)
+        if output_path.parent == Path('.'):
+            output_path = self.output_dir / output_path
+        return output_path
+
+    def synthesize_segment(self, text, lang='en'):
+        """Synthesize one segment to MP3 bytes, using the speech cache if available"""
+        if self.speech_cache is not None:
+            data = self.speech_cache.get(text, lang)
+            if data is not None:
+                return data
+        if self.inflight is None:
+            return self._synthesize_uncached(text, lang)
+        return self.inflight.do((lang, ' '.join(text.split())), self._synthesize_uncached, text, lang)
+
+    def _synthesize_uncached(self, text, lang):
+        data = self.tts_backend(text, lang)
+        if self.speech_cache is not None:
+            self.speech_cache.put(text, lang, data)
+        return data
+
+    def synthesize_segments(self, segments, lang='en'):
+        """Synthesize segments concurrently and return their audio in order"""
+        unique = list(dict.fromkeys(segments))
+        workers = min(self.tts_parallel, len(unique))
+        if workers <= 1:
+            rendered = [self.synthesize_segment(segment, lang) for segment in unique]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts') as executor:
+                rendered = list(executor.map(lambda segment: self.synthesize_segment(segment, lang), unique))
+        audio = dict(zip(unique, rendered))
+        return [audio[segment] for segment in segments]
+
+    def stream_speech(self, sentences, lang='en'):
+        """Synthesize sentences as they arrive and yield (sentence, audio) in order.
+
+        `sentences` may be a slow iterator such as a streaming LLM answer;
+        each sentence is handed to the TTS pool as soon as it is produced, so
+        the first audio is ready about one sentence after generation starts.
+        A sentence whose synthesis fails is logged and yielded with audio None,
+        so the answer text always gets through.
+        """
+        ready = queue.Queue()
+        stopped = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.tts_parallel, thread_name_prefix='tts')
+
+        def produce():
+            try:
+                for sentence in sentences:
+                    if stopped.is_set():
+                        break
+                    ready.put((sentence, executor.submit(self.synthesize_segment, sentence, lang)))
+            except Exception as e:
+                ready.put(e)
+            finally:
+                ready.put(None)
+
+        # The producer drives the sentence iterator, so it keeps the caller's span tags
+        producer = threading.Thread(target=bind(produce), name='tts-feed', daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                sentence, future = item
+                try:
+                    audio = future.result()
+                except Exception as e:
+                    self.logger.error(f"Error generating speech for '{sentence[:60]}': {e}")
+                    audio = None
+                yield sentence, audio
+        finally:
+            stopped.set()
+            executor.shutdown(wait=False)
+
+    def text_to_speech(self, text, output_file, lang='en'):
+        """Convert text to speech and save as audio file
+
+        The text is rendered sentence by sentence so repeated sentences (such
+        as the "Question:"/"Answer:" prompts) come from the speech cache; the
+        MP3 segments are then joined into a single file.
+        """
         try:
             self.logger.info(f"Converting text to speech: {text[:100]}...")
-            tts = gTTS(text=text, lang='en')
-            output_path = self.output_dir / output_file
-            tts.save(str(output_path))
+            segments = split_sentences(text)
+            output_path = self._resolve_output(output_file)
+            with open(output_path, 'wb') as f:
+                for data in self.synthesize_segments(segments, lang):
+                    f.write(data)
             self.logger.info(f"Successfully saved audio to: {output_file}")
             return True
         except Exception as e:
             self.logger.error(f"Error generating speech: {e}")
-            return False 
\ No newline at end of file
+            return False
+
+    def render_conversation(self, turns, output_file, lang='en'):
+        """Speak `turns` ([(title, text), ...]) into one file with the output encoder
+
+        All segments are synthesized together (cache hits included), joined
+        with short pauses between turns and encoded once. Returns the chapter
+        index of the file, or None if it could not be written.
+        """
+        try:
+            segments = [split_sentences(text) for _, text in turns]
+            audio = iter(self.synthesize_segments([s for turn in segments for s in turn], lang))
+            rendered = [(title, [next(audio) for _ in turn]) for (title, _), turn in zip(turns, segments)]
+            output_path = self._resolve_output(output_file)
+            chapters = self.output_encoder.encode(rendered, output_path)
+            self.logger.info(f"Successfully saved audio to: {output_file}")
+            return chapters
+        except Exception as e:
+            self.logger.error(f"Error generating speech: {e}")
+            return None
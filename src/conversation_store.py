@@ -0,0 +1,305 @@
+import argparse
+import json
+import re
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from src.sqlite_db import SQLiteConnections
+
+# Q&A sections of the markdown written by FileHandler.save_qa_text
+MARKDOWN_QA = re.compile(r"```question\n(.*?)\n```\n\n### 🤖 Answer\n\n(.*?)\n\n(?=---\n\n|\n## 📝|\Z)", re.S)
+
+
+def parse_qa_pair(qa_pair):
+    """Split a "Q: ...\\nA: ..." pair into its question and answer"""
+    lines = qa_pair.strip().split('\n')
+    question = lines[0][2:].strip() if lines else ''
+    answer = lines[1][2:].strip() if len(lines) > 1 else ''
+    return question, answer
+
+
+# Append-only log of conversation metadata, one JSON object per line
+METADATA_LOG = "metadata.jsonl"
+
+
+def read_metadata(text_dir):
+    """Return the metadata of every saved conversation in `text_dir`.
+
+    Reads the metadata log and the metadata_*.json files written by older
+    versions. When a conversation was saved more than once, the last record wins.
+    """
+    text_dir = Path(text_dir)
+    records = {}
+    for metadata_file in sorted(text_dir.glob("metadata_*.json")):
+        try:
+            metadata = json.loads(metadata_file.read_text(encoding='utf-8'))
+            records[metadata['timestamp']] = metadata
+        except (OSError, ValueError, KeyError):
+            continue
+    try:
+        with open(text_dir / METADATA_LOG, encoding='utf-8') as log:
+            for line in log:
+                try:
+                    metadata = json.loads(line)
+                    records[metadata['timestamp']] = metadata
+                except (ValueError, KeyError):
+                    # A torn last line after a crash
+                    continue
+    except OSError:
+        pass
+    return list(records.values())
+
+
+def timestamp_epoch(timestamp):
+    """Seconds since the epoch for a conversation timestamp (YYYYmmdd_HHMMSS[_N])"""
+    try:
+        return datetime.strptime(timestamp[:15], "%Y%m%d_%H%M%S").timestamp()
+    except ValueError:
+        return 0.0
+
+
+class ConversationStore:
+    """Indexed history of saved conversations.
+
+    Conversations are kept in SQLite with an FTS5 index over questions and
+    answers, so listing a page or searching stays fast however large the
+    history grows. Pages are fetched with a cursor (the last conversation
+    seen) rather than an offset.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # A new store can be filled from earlier output with import_output
+        self.created = not self.path.exists()
+        self._db = SQLiteConnections(self.path, synchronous='NORMAL', row_factory=sqlite3.Row)
+        self._setup_database()
+
+    def _setup_database(self):
+        conn = self._db.connection()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS conversations (
+                id INTEGER PRIMARY KEY,
+                timestamp TEXT NOT NULL UNIQUE,
+                recorded REAL NOT NULL,
+                original_audio TEXT,
+                num_questions INTEGER NOT NULL,
+                audio_files TEXT NOT NULL,
+                text_file TEXT
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS conversations_recorded ON conversations (recorded, id)")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS qa (
+                id INTEGER PRIMARY KEY,
+                conversation_id INTEGER NOT NULL REFERENCES conversations (id),
+                position INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS qa_conversation ON qa (conversation_id, position)")
+        # External-content index: the text is stored once, in the qa table
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS qa_fts USING fts5("
+            "question, answer, content='qa', content_rowid='id', tokenize='porter unicode61')"
+        )
+
+    def add(self, timestamp, original_audio, qa_pairs, audio_files, text_file=None, replace=True):
+        """Store a conversation; `qa_pairs` are (question, answer) tuples.
+
+        An existing conversation with the same timestamp is replaced, or left
+        alone when `replace` is False. Returns True if anything was written.
+        """
+        conn = self._db.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT id FROM conversations WHERE timestamp = ?", (timestamp,)).fetchone()
+            if row is not None:
+                if not replace:
+                    conn.execute("ROLLBACK")
+                    return False
+                self._delete(conn, row['id'])
+            cursor = conn.execute(
+                "INSERT INTO conversations (timestamp, recorded, original_audio, num_questions, audio_files, text_file) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (timestamp, timestamp_epoch(timestamp), str(original_audio) if original_audio else None,
+                 len(qa_pairs), json.dumps([str(f) for f in audio_files]),
+                 text_file or f"conversation_{timestamp}.md"),
+            )
+            conversation_id = cursor.lastrowid
+            for position, (question, answer) in enumerate(qa_pairs, 1):
+                cursor = conn.execute(
+                    "INSERT INTO qa (conversation_id, position, question, answer) VALUES (?, ?, ?, ?)",
+                    (conversation_id, position, question, answer),
+                )
+                conn.execute(
+                    "INSERT INTO qa_fts (rowid, question, answer) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, question, answer),
+                )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _delete(conn, conversation_id):
+        for row in conn.execute(
+            "SELECT id, question, answer FROM qa WHERE conversation_id = ?", (conversation_id,)
+        ).fetchall():
+            conn.execute(
+                "INSERT INTO qa_fts (qa_fts, rowid, question, answer) VALUES ('delete', ?, ?, ?)",
+                (row['id'], row['question'], row['answer']),
+            )
+        conn.execute("DELETE FROM qa WHERE conversation_id = ?", (conversation_id,))
+        conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    @staticmethod
+    def _metadata(row):
+        """Conversation row in the format of the metadata records"""
+        return {
+            "timestamp": row['timestamp'],
+            "original_audio": row['original_audio'],
+            "num_questions": row['num_questions'],
+            "audio_files": json.loads(row['audio_files']),
+            "text_file": row['text_file'],
+        }
+
+    def list(self, limit=50, before=None):
+        """Return conversations newest first.
+
+        Pass the timestamp of the last conversation of a page as `before` to
+        get the next page. `limit=None` returns everything.
+        """
+        conn = self._db.connection()
+        query = "SELECT * FROM conversations"
+        params = []
+        if before is not None:
+            query += (" WHERE (recorded, id) < (SELECT recorded, id FROM conversations WHERE timestamp = ?)")
+            params.append(before)
+        query += " ORDER BY recorded DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [self._metadata(row) for row in conn.execute(query, params)]
+
+    def get(self, timestamp):
+        """Return a conversation with its Q&A pairs, or None"""
+        conn = self._db.connection()
+        row = conn.execute("SELECT * FROM conversations WHERE timestamp = ?", (timestamp,)).fetchone()
+        if row is None:
+            return None
+        conversation = self._metadata(row)
+        conversation["qa"] = [
+            {"question": qa['question'], "answer": qa['answer']}
+            for qa in conn.execute(
+                "SELECT question, answer FROM qa WHERE conversation_id = ? ORDER BY position", (row['id'],)
+            )
+        ]
+        return conversation
+
+    @staticmethod
+    def _match_expression(query):
+        # Quote every term so user input can't be parsed as FTS syntax
+        return ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+    def search(self, query, limit=20, offset=0, raw=False):
+        """Full-text search over questions and answers, best matches first.
+
+        Terms are matched as plain words (all must occur); pass `raw=True` to
+        use FTS5 query syntax (OR, NEAR, prefix*) directly.
+        """
+        expression = query if raw else self._match_expression(query)
+        if not expression:
+            return []
+        rows = self._db.connection().execute(
+            """SELECT c.timestamp, c.original_audio, q.position, q.question, q.answer,
+                      snippet(qa_fts, -1, '[', ']', '…', 12) AS snippet
+               FROM qa_fts
+               JOIN qa q ON q.id = qa_fts.rowid
+               JOIN conversations c ON c.id = q.conversation_id
+               WHERE qa_fts MATCH ?
+               ORDER BY bm25(qa_fts)
+               LIMIT ? OFFSET ?""",
+            (expression, limit, offset),
+        )
+        return [dict(row) for row in rows]
+
+    def count(self):
+        return self._db.connection().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def import_output(self, text_dir):
+        """Import conversations saved as metadata (log or JSON files) and markdown files.
+
+        Conversations already in the store are left untouched, so the import
+        can be run again safely. Markdown files without metadata are
+        imported too. Returns the number of conversations added.
+        """
+        text_dir = Path(text_dir)
+        added = 0
+        seen = set()
+        for metadata in read_metadata(text_dir):
+            timestamp = metadata['timestamp']
+            text_file = metadata.get('text_file') or f"conversation_{timestamp}.md"
+            seen.add(text_file)
+            qa_pairs = self._read_markdown(text_dir / text_file)
+            added += self.add(timestamp, metadata.get('original_audio'), qa_pairs,
+                              metadata.get('audio_files', []), text_file, replace=False)
+        for markdown_file in sorted(text_dir.glob("conversation_*.md")):
+            if markdown_file.name in seen:
+                continue
+            timestamp = markdown_file.stem[len("conversation_"):]
+            added += self.add(timestamp, None, self._read_markdown(markdown_file), [],
+                              markdown_file.name, replace=False)
+        return added
+
+    @staticmethod
+    def _read_markdown(path):
+        try:
+            text = path.read_text(encoding='utf-8')
+        except OSError:
+            return []
+        return [(question.strip(), answer.strip()) for question, answer in MARKDOWN_QA.findall(text)]
+
+
+def format_conversation(conversation):
+    """One line per conversation for command line listings"""
+    return (f"{conversation['timestamp']}  {conversation['num_questions']} question(s)  "
+            f"{conversation['original_audio'] or ''}")
+
+
+def format_hit(hit):
+    return f"{hit['timestamp']} #{hit['position']}: {hit['question']}\n    {hit['snippet']}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Jarvis conversation history")
+    parser.add_argument('--db', default='resources/output/conversations.sqlite3')
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_cmd = commands.add_parser('import', help="import existing metadata/markdown output")
+    import_cmd.add_argument('text_dir', nargs='?', default='resources/output/text')
+    list_cmd = commands.add_parser('list', help="list conversations, newest first")
+    list_cmd.add_argument('--limit', type=int, default=20)
+    list_cmd.add_argument('--before', help="timestamp of the last conversation of the previous page")
+    search_cmd = commands.add_parser('search', help="full-text search over questions and answers")
+    search_cmd.add_argument('query')
+    search_cmd.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    store = ConversationStore(args.db)
+    if args.command == 'import':
+        started = time.perf_counter()
+        added = store.import_output(args.text_dir)
+        print(f"Imported {added} conversation(s) in {time.perf_counter() - started:.1f}s ({store.count()} total)")
+    elif args.command == 'list':
+        for conversation in store.list(args.limit, args.before):
+            print(format_conversation(conversation))
+    else:
+        for hit in store.search(args.query, args.limit):
+            print(format_hit(hit))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import threading
+from src.audio_output import ConversationEncoder
+from src.audio_processor import AudioProcessor
+from src.conversation_store import ConversationStore
+from src.text_processor import TextProcessor
+from src.file_handler import FileHandler
+from src.llm_handler import LLMHandler
+from src.llm_stream import create_sinks
+from src.manifest import IngestManifest
+from src.persistence import PersistenceWriter
+from src.settings import setting
+from src.tts_cache import SpeechCache
+from src.segmenter import SilenceSegmenter
+from src.stt_backends import create_backend
+
+
+class JarvisEngine:
+    """Long-lived processing context shared by every input file.
+
+    Components are built once instead of per file. The LLM handler (with its
+    pooled keep-alive HTTP session, cached health check and model warm-up)
+    is created on first use.
+    """
+
+    def __init__(self, wake_word, input_dir='resources/input',
+                 output_dir='resources/output', temp_dir='resources/temp'):
+        self.wake_word = wake_word
+        speech_cache = None
+        if setting('TTS_CACHE_ENABLED', True):
+            speech_cache = SpeechCache(
+                setting('TTS_CACHE_DIR', 'resources/cache/tts'),
+                max_bytes=setting('TTS_CACHE_MAX_BYTES', 200 * 1024 * 1024),
+            )
+        output_encoder = None
+        if setting('AUDIO_OUTPUT_FORMAT', 'mp3'):
+            output_encoder = ConversationEncoder(
+                setting('AUDIO_OUTPUT_FORMAT', 'mp3'),
+                bitrate=setting('AUDIO_OUTPUT_BITRATE', None),
+                turn_gap=setting('AUDIO_TURN_GAP_SECONDS', 0.6),
+            )
+        self.audio_proc = AudioProcessor(
+            input_dir, output_dir, temp_dir,
+            speech_cache=speech_cache, tts_parallel=setting('TTS_MAX_PARALLEL', 4),
+            segmenter=SilenceSegmenter(
+                energy_threshold=setting('SEGMENT_ENERGY_THRESHOLD', 300),
+                min_silence_ms=setting('SEGMENT_MIN_SILENCE_MS', 600),
+                max_segment_s=setting('SEGMENT_MAX_SECONDS', 30),
+            ),
+            stt_parallel=setting('STT_MAX_PARALLEL', 4),
+            stt_backend=create_backend(setting('STT_BACKEND', 'google'), **setting('STT_OPTIONS', {})),
+            output_encoder=output_encoder,
+            coalesce=setting('COALESCE_REQUESTS', True),
+        )
+        self.text_proc = TextProcessor(wake_word)
+        store = None
+        if setting('CONVERSATION_STORE_ENABLED', True):
+            store = ConversationStore(setting('CONVERSATION_STORE_PATH', 'resources/output/conversations.sqlite3'))
+        self.file_handler = FileHandler(output_dir, store=store)
+        if store is not None and store.created:
+            # First run with the store: index the conversations saved so far
+            store.import_output(self.file_handler.text_dir)
+        self.persistence = None
+        if setting('PERSIST_ASYNC', True):
+            self.persistence = PersistenceWriter(
+                self.file_handler,
+                fsync_every=setting('PERSIST_FSYNC_EVERY', 8),
+                queue_size=setting('PERSIST_QUEUE_SIZE', 64),
+            )
+        self.manifest = None
+        if setting('INGEST_MANIFEST_ENABLED', True):
+            self.manifest = IngestManifest(
+                setting('INGEST_MANIFEST_PATH', 'resources/cache/ingest_manifest.sqlite3')
+            )
+        self._llm_handler = None
+        self._lock = threading.Lock()
+
+    @property
+    def llm_handler(self):
+        """LLM handler, connected and warmed up on first access"""
+        with self._lock:
+            if self._llm_handler is None:
+                # Batch and watch runs don't render answers token by token
+                handler = LLMHandler(sinks=create_sinks(setting('LLM_STREAM_OUTPUT', 'log')))
+                if setting('OLLAMA_WARM_UP', True):
+                    handler.warm_up()
+                self._llm_handler = handler
+            return self._llm_handler
+
+    def close(self):
+        """Finish pending writes and release the pooled HTTP connections"""
+        if self.persistence is not None:
+            self.persistence.close()
+        with self._lock:
+            if self._llm_handler is not None:
+                self._llm_handler.close()
+                self._llm_handler = None
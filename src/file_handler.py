@@ -1,10 +1,32 @@
 from pathlib import Path
 from datetime import datetime
 import json
+import os
+import tempfile
+from src.conversation_store import METADATA_LOG, parse_qa_pair, read_metadata
+
+
+def write_atomic(path, text, fsync=False):
+    """Write a text file via a temporary file and rename, so readers never see it half-written"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
 
 class FileHandler:
-    def __init__(self, output_dir):
+    def __init__(self, output_dir, store=None):
         self.output_dir = Path(output_dir)
+        self.store = store
         self.text_dir = self.output_dir / 'text'
         self.audio_dir = self.output_dir / 'audio'
         self._setup_directories()
@@ -14,72 +36,83 @@ class FileHandler:
         self.text_dir.mkdir(parents=True, exist_ok=True)
         self.audio_dir.mkdir(parents=True, exist_ok=True)
 
-    def save_qa_text(self, qa_pairs, filename=None):
+    def render_qa_markdown(self, qa_pairs, filename, recorded=None):
+        """Render Q&A pairs as the markdown of a conversation file, in one string"""
+        timestamp = recorded or datetime.now()
+        parts = [
+            "# Conversation Log\n\n",
+            f"*Recorded on: {timestamp.strftime('%B %d, %Y at %I:%M:%S %p')}*\n\n",
+            "---\n\n",
+        ]
+
+        # Each Q&A pair
+        for i, qa_pair in enumerate(qa_pairs, 1):
+            lines = qa_pair.strip().split('\n')
+            if len(lines) >= 2:
+                question = lines[0][2:]  # Remove "Q: "
+                answer = lines[1][3:]    # Remove "A: "
+
+                # Question section with emoji and formatting
+                parts.append(f"## 💭 Question {i}\n\n")
+                parts.append(f"```question\n{question}\n```\n\n")
+
+                # Answer section with emoji and formatting
+                parts.append("### 🤖 Answer\n\n")
+
+                # Format answer text with proper markdown
+                formatted_answer = answer.replace('\n', '\n\n')  # Ensure proper paragraph breaks
+
+                # If answer contains lists, format them properly
+                if any(line.strip().startswith(('-', '*', '1.')) for line in formatted_answer.split('\n')):
+                    formatted_answer = '\n'.join(
+                        f"{line}" if line.strip().startswith(('-', '*', '1.')) else line
+                        for line in formatted_answer.split('\n')
+                    )
+
+                parts.append(f"{formatted_answer}\n\n")
+
+                # Add separator between Q&A pairs
+                if i < len(qa_pairs):
+                    parts.append("---\n\n")
+
+        # Footer with audio file reference
+        parts.append("\n## 📝 Conversation Details\n\n")
+        parts.append("- Audio responses are available in the `audio` directory\n")
+        parts.append(f"- Conversation ID: `{filename.replace('.md', '')}`\n")
+        parts.append("\n---\n\n")
+        parts.append("*Generated by Jarvis Voice Assistant*")
+        return ''.join(parts)
+
+    def save_qa_text(self, qa_pairs, filename=None, recorded=None):
         """Save Q&A pairs to a markdown file in a beautiful conversation format"""
         if filename is None:
             filename = f"conversation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
         else:
             # Ensure .md extension
             filename = filename.replace('.txt', '.md')
-        
-        file_path = self.text_dir / filename
-        timestamp = datetime.now()
-        
+
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                # Write header with metadata
-                f.write(f"# Conversation Log\n\n")
-                f.write(f"*Recorded on: {timestamp.strftime('%B %d, %Y at %I:%M:%S %p')}*\n\n")
-                f.write("---\n\n")
-                
-                # Write each Q&A pair
-                for i, qa_pair in enumerate(qa_pairs, 1):
-                    lines = qa_pair.strip().split('\n')
-                    if len(lines) >= 2:
-                        question = lines[0][2:]  # Remove "Q: "
-                        answer = lines[1][3:]    # Remove "A: "
-                        
-                        # Question section with emoji and formatting
-                        f.write(f"## 💭 Question {i}\n\n")
-                        f.write(f"```question\n{question}\n```\n\n")
-                        
-                        # Answer section with emoji and formatting
-                        f.write(f"### 🤖 Answer\n\n")
-                        
-                        # Format answer text with proper markdown
-                        formatted_answer = answer.replace('\n', '\n\n')  # Ensure proper paragraph breaks
-                        
-                        # If answer contains lists, format them properly
-                        if any(line.strip().startswith(('-', '*', '1.')) for line in formatted_answer.split('\n')):
-                            formatted_answer = '\n'.join(
-                                f"{line}" if line.strip().startswith(('-', '*', '1.')) else line
-                                for line in formatted_answer.split('\n')
-                            )
-                        
-                        f.write(f"{formatted_answer}\n\n")
-                        
-                        # Add separator between Q&A pairs
-                        if i < len(qa_pairs):
-                            f.write("---\n\n")
-                
-                # Footer with audio file reference
-                f.write("\n## 📝 Conversation Details\n\n")
-                f.write("- Audio responses are available in the `audio` directory\n")
-                f.write(f"- Conversation ID: `{filename.replace('.md', '')}`\n")
-                f.write("\n---\n\n")
-                f.write("*Generated by Jarvis Voice Assistant*")
-            
-            return filename
+            return self.write_qa_text(qa_pairs, filename, recorded)
         except Exception as e:
             print(f"❌ Error saving Q&A file: {e}")
             return None
 
+    def write_qa_text(self, qa_pairs, filename, recorded=None, fsync=False):
+        """Write a conversation's markdown atomically; raises on failure"""
+        write_atomic(self.text_dir / filename, self.render_qa_markdown(qa_pairs, filename, recorded), fsync)
+        return filename
+
     def get_audio_path(self, filename):
         """Get the full path for an audio file"""
         return self.audio_dir / filename
 
-    def save_conversation_metadata(self, original_audio, qa_pairs, audio_files, timestamp):
-        """Save conversation metadata for future reference"""
+    @staticmethod
+    def conversation_metadata(original_audio, qa_pairs, audio_files, timestamp, chapters=None):
+        """Metadata record of a conversation
+
+        `chapters` is the offset index of a single-file recording: the title,
+        start and end (in seconds) of each spoken turn.
+        """
         metadata = {
             "timestamp": timestamp,
             "original_audio": str(original_audio),
@@ -87,22 +120,56 @@ class FileHandler:
             "audio_files": [str(f) for f in audio_files],
             "text_file": f"conversation_{timestamp}.md"  # Updated extension
         }
-        
-        metadata_file = self.text_dir / f"metadata_{timestamp}.json"
+        if chapters:
+            metadata["chapters"] = chapters
+        return metadata
+
+    @property
+    def metadata_log(self):
+        return self.text_dir / METADATA_LOG
+
+    def append_metadata(self, records, log=None, fsync=False):
+        """Append metadata records to the JSONL log in a single write"""
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        if log is None:
+            with open(self.metadata_log, 'a', encoding='utf-8') as f:
+                f.write(data)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            return
+        log.write(data)
+        log.flush()
+        if fsync:
+            os.fsync(log.fileno())
+
+    def index_conversation(self, metadata, qa_pairs):
+        """Add a conversation to the store, if there is one"""
+        if self.store is not None:
+            self.store.add(metadata["timestamp"], metadata["original_audio"],
+                           [parse_qa_pair(pair) for pair in qa_pairs], metadata["audio_files"])
+
+    def save_conversation_metadata(self, original_audio, qa_pairs, audio_files, timestamp, chapters=None):
+        """Save conversation metadata for future reference"""
+        metadata = self.conversation_metadata(original_audio, qa_pairs, audio_files, timestamp, chapters)
         try:
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2)
+            self.append_metadata([metadata])
         except Exception as e:
             print(f"❌ Error saving metadata: {e}")
 
-    def list_conversations(self):
-        """List all available conversations"""
-        conversations = []
-        for metadata_file in self.text_dir.glob("metadata_*.json"):
-            try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                    conversations.append(metadata)
-            except Exception:
-                continue
-        return sorted(conversations, key=lambda x: x['timestamp'], reverse=True) 
\ No newline at end of file
+        try:
+            self.index_conversation(metadata, qa_pairs)
+        except Exception as e:
+            print(f"❌ Error indexing conversation: {e}")
+
+    def list_conversations(self, limit=None, before=None):
+        """List available conversations, newest first
+
+        With a conversation store this is an indexed query that can be paged
+        (`limit`, `before` = timestamp of the previous page's last entry);
+        otherwise every metadata file is read.
+        """
+        if self.store is not None:
+            return self.store.list(limit, before)
+        conversations = sorted(read_metadata(self.text_dir), key=lambda x: x['timestamp'], reverse=True)
+        return conversations if limit is None else conversations[:limit] 
\ No newline at end of file
@@ -0,0 +1,189 @@
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """One Ollama server and what the pool knows about it"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+        self.requests = 0
+        self.last_used = 0
+        self.last_error = None
+
+    def __repr__(self):
+        state = 'healthy' if self.healthy else 'ejected'
+        return f"<Endpoint {self.base_url} {state} outstanding={self.outstanding}>"
+
+
+class EndpointPool:
+    """Spread LLM requests over several Ollama servers.
+
+    Each request goes to the healthy endpoint with the fewest requests in
+    flight. An endpoint that fails `eject_after` requests in a row (or a
+    health probe) is ejected until a probe finds it answering again. Failed
+    requests are retried on another endpoint after a jittered exponential
+    backoff. Only failures before the response starts are retried, since a
+    partly streamed answer can't be replayed transparently.
+    """
+
+    def __init__(self, base_urls, session, retries=2, backoff=0.5, max_backoff=8.0,
+                 eject_after=2, probe_interval=10.0, probe_timeout=2.0):
+        if not base_urls:
+            raise ValueError("At least one LLM endpoint is required")
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(base_urls)]
+        self.session = session
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.eject_after = eject_after
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._order = itertools.count(1)
+        self._stop = threading.Event()
+        self._prober = None
+
+    def healthy(self):
+        with self._lock:
+            return [endpoint for endpoint in self.endpoints if endpoint.healthy]
+
+    def acquire(self, prefer=None, exclude=()):
+        """Reserve the endpoint to send the next request to.
+
+        `prefer` (e.g. the endpoint holding a conversation's cached prompt)
+        is used while it is healthy and not excluded. Otherwise the least
+        busy healthy endpoint wins; when none is healthy, an ejected one is
+        tried anyway.
+        """
+        self._start_prober()
+        with self._lock:
+            if prefer is not None and prefer.healthy and prefer not in exclude:
+                endpoint = prefer
+            else:
+                candidates = ([e for e in self.endpoints if e.healthy and e not in exclude]
+                              or [e for e in self.endpoints if e not in exclude]
+                              or self.endpoints)
+                # Least outstanding requests; ties go to the least recently used
+                endpoint = min(candidates, key=lambda e: (not e.healthy, e.outstanding, e.last_used))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            endpoint.last_used = next(self._order)
+            return endpoint
+
+    def release(self, endpoint, ok=True, error=None):
+        """Return an endpoint after a request, recording whether it succeeded"""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.failures = 0
+                return
+            endpoint.failures += 1
+            endpoint.last_error = str(error) if error is not None else None
+            if endpoint.healthy and endpoint.failures >= self.eject_after:
+                endpoint.healthy = False
+                logger.warning(f"Ejecting LLM endpoint {endpoint.base_url} after "
+                               f"{endpoint.failures} failures: {endpoint.last_error}")
+
+    def set_health(self, endpoint, healthy, error=None):
+        with self._lock:
+            if healthy == endpoint.healthy:
+                return
+            endpoint.healthy = healthy
+            endpoint.failures = 0 if healthy else max(endpoint.failures, self.eject_after)
+            endpoint.last_error = None if healthy else str(error)
+        if healthy:
+            logger.info(f"LLM endpoint {endpoint.base_url} is back, re-admitting it")
+        else:
+            logger.warning(f"Ejecting LLM endpoint {endpoint.base_url}: {error}")
+
+    def probe(self, endpoint):
+        """Check an endpoint with a cheap GET and update its health; returns the result"""
+        try:
+            response = self.session.get(endpoint.base_url, timeout=self.probe_timeout)
+            response.close()
+            healthy = response.status_code == 200
+            error = None if healthy else f"status {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            healthy, error = False, e
+        self.set_health(endpoint, healthy, error)
+        return healthy
+
+    def probe_all(self):
+        return [self.probe(endpoint) for endpoint in self.endpoints]
+
+    def _start_prober(self):
+        """Start the background health checks (once, and only when they are enabled)"""
+        if not self.probe_interval or self._prober is not None:
+            return
+        with self._lock:
+            if self._prober is not None:
+                return
+            self._prober = threading.Thread(target=self._probe_loop, name='llm-health', daemon=True)
+        self._prober.start()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            for endpoint in self.endpoints:
+                if self._stop.is_set():
+                    return
+                self.probe(endpoint)
+
+    def _delay(self, attempt):
+        # "Full jitter": spreads the retries of concurrent requests apart
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @contextmanager
+    def post(self, path, prefer=None, **kwargs):
+        """POST `path` to the best endpoint, retrying others; yields (endpoint, response).
+
+        Connection errors, timeouts and 5xx answers count as failures and are
+        retried; the last error is raised once the retries are used up. The
+        response is closed and the endpoint released when the block exits.
+        """
+        tried = []
+        for attempt in range(self.retries + 1):
+            endpoint = self.acquire(prefer, exclude=tried)
+            try:
+                response = self.session.post(endpoint.base_url + path, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            else:
+                if response.status_code < 500:
+                    break
+                response.close()
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} Server Error from {endpoint.base_url}", response=response
+                )
+            self.release(endpoint, ok=False, error=error)
+            tried.append(endpoint)
+            if attempt == self.retries:
+                raise error
+            logger.warning(f"LLM request to {endpoint.base_url} failed ({error}), retrying")
+            time.sleep(self._delay(attempt))
+
+        ok, error = True, None
+        try:
+            yield endpoint, response
+        except requests.exceptions.RequestException as e:
+            # Client errors (e.g. 404 for a missing model) are not the server's fault
+            response_status = getattr(e.response, 'status_code', None) or 500
+            ok, error = response_status < 500, e
+            raise
+        finally:
+            response.close()
+            self.release(endpoint, ok, error)
+
+    def close(self):
+        self._stop.set()
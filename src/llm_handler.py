@@ -1,146 +1,433 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+import logging
 import time
-import sys
-from config_local import OLLAMA_API_URL, MODEL_NAME
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from src.llm_endpoints import EndpointPool
+from src.llm_stream import ConsoleSink, StreamResult, TokenStream, json_loader
+from src.metrics import bind, record_llm_stream, span, tagged, tracer
+from src.settings import setting
+from src.response_cache import ResponseCache
+from src.single_flight import Abandoned, SingleFlight
+from src.text_processor import SentenceBuffer
+
+ANSWER_INSTRUCTION = "Please provide a clear and concise answer, focusing on the key points."
 
 class LLMHandler:
-    def __init__(self):
-        self.api_url = OLLAMA_API_URL
-        self.model = MODEL_NAME
+    # Health checks and warm-ups already done in this process, keyed by server
+    _checked_servers = set()
+    _warmed_models = set()
+    _check_lock = threading.Lock()
+
+    def __init__(self, max_parallel=None, session=None, cache=None, sinks=None):
+        """`sinks` receive the progress output (see src.llm_stream); by default
+        answers are rendered on the console. Pass [] to run headless.
+        """
+        self.api_url = setting('OLLAMA_API_URL', 'http://127.0.0.1:11434/api/generate')
+        self.model = setting('MODEL_NAME')
+        self.max_parallel = max_parallel or setting('LLM_MAX_PARALLEL', 4)
+        self.keep_alive = setting('OLLAMA_KEEP_ALIVE', '30m')
+        parts = urlsplit(self.api_url)
+        self.base_url = f"{parts.scheme}://{parts.netloc}"
+        self.api_path = parts.path or '/api/generate'
+        # Several Ollama servers can share the load (OLLAMA_ENDPOINTS)
+        endpoints = setting('OLLAMA_ENDPOINTS', None) or [self.base_url]
+        self.session = session or self.create_session(max(10, self.max_parallel), hosts=len(endpoints))
+        self.pool = EndpointPool(
+            endpoints, self.session,
+            retries=setting('LLM_RETRIES', 2),
+            backoff=setting('LLM_RETRY_BACKOFF', 0.5),
+            eject_after=setting('LLM_EJECT_AFTER_FAILURES', 2),
+            probe_interval=setting('LLM_HEALTH_INTERVAL', 10.0),
+        )
+        self.cache = cache if cache is not None else self._create_cache()
+        self.sinks = [ConsoleSink()] if sinks is None else list(sinks)
+        self.loads = json_loader(setting('LLM_FAST_JSON', True))
+        self.inflight = SingleFlight('llm') if setting('COALESCE_REQUESTS', True) else None
         self._verify_ollama_connection()
 
+    @staticmethod
+    def _create_cache():
+        """Create the response cache described by the config, if enabled"""
+        if not setting('LLM_CACHE_ENABLED', True):
+            return None
+        return ResponseCache(
+            setting('LLM_CACHE_PATH', 'resources/cache/llm_responses.sqlite3'),
+            ttl=setting('LLM_CACHE_TTL', 7 * 24 * 3600),
+            max_entries=setting('LLM_CACHE_MAX_ENTRIES', 10000),
+            max_bytes=setting('LLM_CACHE_MAX_BYTES', 50 * 1024 * 1024),
+        )
+
+    @staticmethod
+    def create_session(pool_size=4, hosts=1):
+        """Create a keep-alive HTTP session with room for `pool_size` parallel requests per host"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(1, hosts), pool_maxsize=max(1, pool_size))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
     def _verify_ollama_connection(self):
-        """Verify that Ollama is running and accessible"""
-        try:
-            response = requests.get("http://127.0.0.1:11434")
-            if response.status_code == 200:
-                print("✅ Successfully connected to Ollama")
-            else:
-                print(f"⚠️  Warning: Ollama returned status code {response.status_code}")
-        except requests.exceptions.ConnectionError:
-            print("❌ Could not connect to Ollama. Please ensure it's running with:")
-            print("   ollama serve")
-            raise ConnectionError("Ollama service not accessible")
+        """Verify that Ollama is running and accessible (once per process and server)
+
+        Unreachable servers of a multi-server pool are ejected until they come
+        back; it's an error only when none can be reached.
+        """
+        with LLMHandler._check_lock:
+            unchecked = [e for e in self.pool.endpoints if e.base_url not in LLMHandler._checked_servers]
+            if not unchecked:
+                return
+            reachable = 0
+            for endpoint in unchecked:
+                where = f" at {endpoint.base_url}" if len(self.pool.endpoints) > 1 else ""
+                try:
+                    response = self.session.get(endpoint.base_url)
+                    if response.status_code == 200:
+                        self._notice(f"✅ Successfully connected to Ollama{where}")
+                    else:
+                        self._notice(f"⚠️  Warning: Ollama{where} returned status code {response.status_code}",
+                                     logging.WARNING)
+                    LLMHandler._checked_servers.add(endpoint.base_url)
+                    reachable += 1
+                except requests.exceptions.ConnectionError as e:
+                    self.pool.set_health(endpoint, False, e)
+                    if len(self.pool.endpoints) > 1:
+                        self._notice(f"⚠️  Could not connect to Ollama{where}; continuing without it",
+                                     logging.WARNING)
+            if not reachable and len(unchecked) == len(self.pool.endpoints):
+                self._notice("❌ Could not connect to Ollama. Please ensure it's running with:", logging.ERROR)
+                self._notice("   ollama serve", logging.ERROR)
+                raise ConnectionError("Ollama service not accessible")
+
+    def warm_up(self):
+        """Load the model ahead of the first question and keep it resident (on every server)"""
+        warmed = False
+        with LLMHandler._check_lock:
+            for endpoint in self.pool.healthy():
+                key = (endpoint.base_url, self.model)
+                if key in LLMHandler._warmed_models:
+                    warmed = True
+                    continue
+                try:
+                    # A generate request without a prompt only loads the model
+                    response = self.session.post(
+                        endpoint.base_url + self.api_path,
+                        json={"model": self.model, "keep_alive": self.keep_alive},
+                    )
+                    response.raise_for_status()
+                    LLMHandler._warmed_models.add(key)
+                    warmed = True
+                except requests.exceptions.RequestException as e:
+                    self._notice(f"⚠️  Could not preload model '{self.model}': {e}", logging.WARNING)
+        return warmed
+
+    def close(self):
+        """Stop the health checks and release the pooled connections"""
+        self.pool.close()
+        self.session.close()
+
+    def _notice(self, message, level=logging.INFO):
+        for sink in self.sinks:
+            sink.notice(message, level)
 
     def _is_incomplete_response(self, text):
         """Check if response seems incomplete"""
         incomplete_markers = ['<think>', '<thinking>', '...', 'Let me think']
         return any(marker in text for marker in incomplete_markers) or len(text) < 20
 
-    def generate_response(self, prompt):
-        """Generate response from Ollama API using streaming to ensure completion"""
-        try:
-            # Append instruction for concise answer
-            enhanced_prompt = f"{prompt}\n[Instruction: Please provide a clear and concise answer, focusing on the key points.]"
-            
-            data = {
-                "model": self.model,
-                "prompt": enhanced_prompt,
-                "stream": True,
-                "options": {
-                    "temperature": 0.7,
-                    "num_predict": 2000,
-                    "top_k": 40,
-                    "top_p": 0.9,
-                }
+    def _build_request(self, prompt):
+        """Return the enhanced prompt and the Ollama request payload for a question"""
+        # Append instruction for concise answer
+        enhanced_prompt = f"{prompt}\n[Instruction: {ANSWER_INSTRUCTION}]"
+        
+        data = {
+            "model": self.model,
+            "prompt": enhanced_prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "temperature": 0.7,
+                "num_predict": 2000,
+                "top_k": 40,
+                "top_p": 0.9,
             }
-            
-            print("\n🤔 Starting LLM processing...")
-            start_time = time.time()
-            
-            response = requests.post(self.api_url, json=data, stream=True)
-            
-            if response.status_code == 404:
-                print(f"❌ Model '{self.model}' not found. Try running:")
-                print(f"   ollama pull {self.model}")
-                return "I'm sorry, but I'm not properly configured yet. Please make sure the model is installed."
-            
-            response.raise_for_status()
-            
-            # Process streaming response
-            response_parts = []
-            current_response_length = 0
-            spinner_chars = ['⠋', '⠙', '⠹', '⠸', '⠼', '⠴', '⠦', '⠧', '⠇', '⠏']
-            spinner_idx = 0
-            last_update = time.time()
-            last_newline = True
-            buffer = ""  # Buffer for accumulating partial words/sentences
-            
-            print("\nReceiving response:")
-            
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        json_response = json.loads(line)
-                        
-                        if 'response' in json_response:
-                            chunk = json_response['response']
-                            current_response_length += len(chunk.split())
-                            
-                            # Check if we've exceeded 2000 words
-                            if current_response_length > 2000:
-                                print("\n⚠️  Response exceeded 2000 words, truncating...")
-                                break
-                            
-                            # Accumulate in buffer
-                            buffer += chunk
-                            
-                            # If we have a complete sentence or significant punctuation, flush the buffer
-                            if any(p in buffer for p in ['.', '!', '?', '\n', ';']) or len(buffer) > 50:
-                                response_parts.append(buffer)
-                                
-                                # Print the accumulated buffer
-                                current_time = time.time()
-                                if current_time - last_update >= 0.1:
-                                    spinner = spinner_chars[spinner_idx]
-                                    spinner_idx = (spinner_idx + 1) % len(spinner_chars)
-                                    last_update = current_time
-                                    
-                                    if last_newline:
-                                        print(f"{spinner} {buffer}", end='')
-                                        last_newline = False
-                                    else:
-                                        print(buffer, end='')
-                                    
-                                    if buffer.endswith('\n'):
-                                        last_newline = True
-                                    
-                                    sys.stdout.flush()
-                                buffer = ""
-                        
-                        # Check if response is complete
-                        if json_response.get('done', False):
-                            # Flush any remaining buffer
-                            if buffer:
-                                response_parts.append(buffer)
-                                print(buffer, end='')
-                            break
-                            
-                    except json.JSONDecodeError:
-                        continue
-            
-            # Ensure we end with a newline
-            if not last_newline:
-                print()
-                
-            elapsed_time = time.time() - start_time
-            print(f"\n✨ Response completed in {elapsed_time:.1f} seconds")
-            
-            # Join all parts with proper spacing
-            final_response = ' '.join(''.join(response_parts).split())
-            
-            return final_response
-            
-        except requests.exceptions.ConnectionError:
-            error_msg = "❌ Connection error. Please ensure Ollama is running with 'ollama serve'"
-            print(error_msg)
-            return error_msg
-        except requests.exceptions.Timeout:
-            error_msg = "⏰ Request timed out. The model is taking too long to respond."
-            print(error_msg)
-            return error_msg
+        }
+        return enhanced_prompt, data
+
+    def conversation(self, mode='context'):
+        """Start a conversation for the questions of one recording (see LLMConversation)"""
+        return LLMConversation(self, mode)
+
+    def generate_response(self, prompt, use_cache=True):
+        """Generate response from Ollama API using streaming to ensure completion
+
+        Cached answers are returned without contacting Ollama; pass
+        `use_cache=False` to force a fresh generation. Failures are returned
+        as a message to show instead; use `answer` to tell them apart.
+        """
+        result = self.answer(prompt, use_cache)
+        return result.error or result.text
+
+    def answer(self, prompt, use_cache=True):
+        """Like generate_response, but return the StreamResult (text or error)"""
+        result = StreamResult()
+        with span('llm_call') as llm_span:
+            for _ in self._stream_answer(prompt, use_cache, llm_span, result):
+                pass
+        return result
+
+    def _stream_answer(self, prompt, use_cache, llm_span, result, conversation=None):
+        """Yield the text chunks of the answer to `prompt` as they arrive.
+
+        Shared by generate_response, stream_sentences and LLMConversation. A
+        cached answer is yielded as one chunk. When the request fails,
+        `result.error` is set to the message to show instead; otherwise
+        `result.text` ends up holding the normalized answer, which is also
+        cached (conversation turns bypass the cache). While an identical
+        question is already being answered, its answer is awaited and
+        yielded as one chunk instead.
+        """
+        enhanced_prompt, data = self._build_request(prompt)
+        path = self.api_path
+        prefer = None
+        if conversation is not None:
+            # An answer depends on the turns before it, so turns skip the cache
+            use_cache = False
+            path, data = conversation.build_request(prompt, data)
+            # Stay on the server that has the conversation's prompt cached
+            prefer = conversation.endpoint
+            llm_span.set(conversation=conversation.mode, turn=conversation.turns + 1)
+
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key = self.cache.make_key(self.model, enhanced_prompt, data["options"])
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._notice("\n⚡ Using cached response")
+                record_llm_stream(llm_span, cached=True)
+                result.text = cached
+                yield cached
+                return
+
+        if conversation is not None or self.inflight is None:
+            yield from self._stream_upstream(prompt, path, prefer, data, llm_span, result, conversation, cache_key)
+            return
+
+        # Identical questions asked at the same time (e.g. the same clip in
+        # two recordings) share one request; conversation turns never do
+        flight_key = (path, cache_key or ResponseCache.make_key(self.model, enhanced_prompt, data["options"]))
+        while True:
+            flight, leader = self.inflight.begin(flight_key)
+            if leader:
+                break
+            try:
+                text, error = flight.result()
+            except Abandoned:
+                continue
+            self._notice("\n🔗 Sharing the answer of an identical request in progress")
+            llm_span.set(coalesced=True)
+            if error:
+                result.error = error
+                return
+            result.text = text
+            if cache_key is not None and text:
+                self.cache.put(cache_key, self.model, text)
+            yield text
+            return
+
+        completed = False
+        try:
+            yield from self._stream_upstream(prompt, path, prefer, data, llm_span, result, conversation, cache_key)
+            completed = True
+        finally:
+            if completed:
+                self.inflight.finish(flight_key, flight, (result.text, result.error))
+            else:
+                # Stopped early (e.g. the consumer went away): waiters ask themselves
+                self.inflight.finish(flight_key, flight, error=Abandoned())
+
+    def _stream_upstream(self, prompt, path, prefer, data, llm_span, result, conversation, cache_key):
+        """Request the answer from Ollama and yield its chunks (see _stream_answer)"""
+        writers = [sink.open() for sink in self.sinks]
+        start_time = time.perf_counter()
+        try:
+            with self.pool.post(path, prefer=prefer, json=data, stream=True) as (endpoint, response):
+                llm_span.set(endpoint=endpoint.base_url)
+
+                if response.status_code == 404:
+                    self._notice(f"❌ Model '{self.model}' not found. Try running:", logging.ERROR)
+                    self._notice(f"   ollama pull {self.model}", logging.ERROR)
+                    result.error = "I'm sorry, but I'm not properly configured yet. Please make sure the model is installed."
+                    return
+
+                response.raise_for_status()
+
+                stream = TokenStream(response.iter_lines(), loads=self.loads)
+                if writers:
+                    for chunk in stream:
+                        for writer in writers:
+                            writer.write(chunk)
+                        yield chunk
+                else:
+                    yield from stream
+
+            elapsed_time = time.perf_counter() - start_time
+            if stream.truncated:
+                self._notice("\n⚠️  Response exceeded 2000 words, truncating...", logging.WARNING)
+            for writer in writers:
+                writer.close(stream, elapsed_time)
+            record_llm_stream(
+                llm_span,
+                time_to_first_token=stream.first_token_at - start_time if stream.first_token_at else None,
+                tokens=stream.eval_count or stream.tokens,
+                generation_seconds=time.perf_counter() - stream.first_token_at if stream.first_token_at else None,
+            )
+
         except requests.exceptions.RequestException as e:
-            error_msg = f"❌ Error communicating with Ollama: {str(e)}"
-            print(error_msg)
-            return error_msg 
\ No newline at end of file
+            if isinstance(e, requests.exceptions.ConnectionError):
+                result.error = "❌ Connection error. Please ensure Ollama is running with 'ollama serve'"
+            elif isinstance(e, requests.exceptions.Timeout):
+                result.error = "⏰ Request timed out. The model is taking too long to respond."
+            else:
+                result.error = f"❌ Error communicating with Ollama: {str(e)}"
+            llm_span.error = f"{type(e).__name__}: {e}"
+            self._notice(result.error, logging.ERROR)
+            return
+
+        result.text = stream.text
+        if conversation is not None:
+            conversation.record(prompt, result.text, stream.context, endpoint)
+        if cache_key is not None and result.text:
+            self.cache.put(cache_key, self.model, result.text)
+
+    def generate_responses(self, prompts, max_parallel=None):
+        """Generate responses for several prompts concurrently.
+
+        At most `max_parallel` requests are in flight at once. Answers are
+        returned in the same order as `prompts`.
+        """
+        return [result.error or result.text for result in self.answers(prompts, max_parallel)]
+
+    def answers(self, prompts, max_parallel=None):
+        """Like generate_responses, but return a StreamResult per prompt"""
+        prompts = list(prompts)
+        if not prompts:
+            return []
+        workers = min(len(prompts), max_parallel or self.max_parallel)
+        if workers <= 1:
+            return [self._answer_tagged(idx, prompt) for idx, prompt in enumerate(prompts, 1)]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm') as executor:
+            futures = [executor.submit(bind(self._answer_tagged), idx, prompt)
+                       for idx, prompt in enumerate(prompts, 1)]
+            return [future.result() for future in futures]
+
+    def _answer_tagged(self, question_idx, prompt):
+        with tagged(question=question_idx):
+            return self.answer(prompt)
+
+    def stream_sentences(self, prompt, use_cache=True, conversation=None, result=None):
+        """Yield the answer to `prompt` one complete sentence at a time.
+
+        Sentences are released as soon as they are generated, so callers can
+        start working on them (e.g. speech synthesis) while the rest of the
+        answer is still streaming. Errors are yielded as a single message,
+        matching what generate_response returns; pass a StreamResult as
+        `result` to find out afterwards whether the answer failed.
+        """
+        result = result if result is not None else StreamResult()
+        sentences = SentenceBuffer()
+        # Not a context-managed span: the generator may be resumed from other contexts
+        llm_span = tracer.start_span('llm_call', streaming=True)
+        try:
+            for chunk in self._stream_answer(prompt, use_cache, llm_span, result, conversation):
+                yield from sentences.feed(chunk)
+        finally:
+            tracer.end_span(llm_span)
+        if result.error:
+            yield result.error
+            return
+        yield from sentences.flush()
+
+
+class LLMConversation:
+    """Answer the questions of one recording as a single conversation.
+
+    Independent requests make Ollama encode the instruction (and nothing
+    else is shared) for every question. Here the instruction is sent once and
+    each turn builds on the previous one, so Ollama only has to process the
+    new question:
+
+    - mode "context": /api/generate with the `context` tokens returned by
+      the previous answer
+    - mode "chat": /api/chat with a shared system prompt and the earlier
+      turns, whose prefix Ollama keeps cached
+
+    Turns are sequential, so this trades the parallel fan-out of
+    LLMHandler.generate_responses for less prompt processing per question.
+    """
+
+    MODES = ('context', 'chat')
+
+    def __init__(self, handler, mode='context'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown conversation mode '{mode}'. Available: {', '.join(self.MODES)}")
+        self.handler = handler
+        self.mode = mode
+        self.context = None
+        self.endpoint = None
+        self.messages = [{"role": "system", "content": ANSWER_INSTRUCTION}]
+        self.turns = 0
+
+    def build_request(self, prompt, data):
+        """Turn an independent generate payload into this conversation's next turn"""
+        data = dict(data)
+        del data["prompt"]
+        if self.mode == 'chat':
+            data["messages"] = self.messages + [{"role": "user", "content": prompt}]
+            return '/api/chat', data
+        data["prompt"] = prompt
+        if self.context:
+            data["context"] = self.context
+        else:
+            data["system"] = ANSWER_INSTRUCTION
+        return self.handler.api_path, data
+
+    def record(self, prompt, answer, context, endpoint=None):
+        self.turns += 1
+        if endpoint is not None:
+            self.endpoint = endpoint
+        if self.mode == 'chat':
+            self.messages += [{"role": "user", "content": prompt}, {"role": "assistant", "content": answer}]
+        elif context:
+            self.context = context
+
+    def generate_response(self, prompt):
+        """Answer the next question of the conversation (never from the response cache)"""
+        result = self.answer(prompt)
+        return result.error or result.text
+
+    def answer(self, prompt):
+        """Like generate_response, but return the StreamResult (text or error)"""
+        result = StreamResult()
+        with span('llm_call') as llm_span:
+            for _ in self.handler._stream_answer(prompt, False, llm_span, result, self):
+                pass
+        return result
+
+    def generate_responses(self, prompts):
+        """Answer `prompts` in order as consecutive turns"""
+        return [result.error or result.text for result in self.answers(prompts)]
+
+    def answers(self, prompts):
+        """Like generate_responses, but return a StreamResult per prompt"""
+        results = []
+        for idx, prompt in enumerate(prompts, 1):
+            with tagged(question=idx):
+                results.append(self.answer(prompt))
+        return results
+
+    def stream_sentences(self, prompt, result=None):
+        """Yield the next answer sentence by sentence (see LLMHandler.stream_sentences)"""
+        return self.handler.stream_sentences(prompt, False, conversation=self, result=result)
@@ -0,0 +1,227 @@
+"""Reading streamed Ollama responses and rendering their progress.
+
+`TokenStream` turns the NDJSON lines of a streamed response into text
+chunks, counting tokens and words and normalizing whitespace incrementally.
+What the user sees is decided by sinks: `ConsoleSink` draws the interactive
+spinner output, `LoggerSink` writes one summary line per answer and
+`CallbackSink` hands chunks to a function. Without sinks nothing is rendered at all, which is
+what batch and daemon runs want.
+"""
+import json
+import logging
+import sys
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def json_loader(fast=True):
+    """Return orjson.loads when available (and wanted), else json.loads"""
+    if fast and orjson is not None:
+        return orjson.loads
+    return json.loads
+
+
+class TokenStream:
+    """Iterate the text chunks of a streamed Ollama response (generate or chat).
+
+    Stops after `max_words` words (`truncated` is then set). Malformed lines
+    are skipped. `text` is the answer so far with whitespace runs collapsed
+    to single spaces, built as the chunks arrive.
+    """
+
+    def __init__(self, lines, max_words=2000, loads=json.loads):
+        self.lines = lines
+        self.max_words = max_words
+        self.loads = loads
+        self.tokens = 0
+        self.words = 0
+        self.eval_count = None
+        self.context = None
+        self.truncated = False
+        self.first_token_at = None
+        self._in_word = False
+        self._parts = []
+
+    @property
+    def text(self):
+        return ''.join(self._parts)
+
+    def _normalize(self, chunk):
+        """Return `chunk` with normalized whitespace and the number of words it starts"""
+        words = chunk.split()
+        if not words:
+            self._in_word = False
+            return '', 0
+        # A chunk that continues the previous chunk's word doesn't start a new one
+        continues = self._in_word and not chunk[0].isspace()
+        self._in_word = not chunk[-1].isspace()
+        text = ' '.join(words)
+        if self._parts and not continues:
+            text = ' ' + text
+        return text, len(words) - continues
+
+    def __iter__(self):
+        loads = self.loads
+        for line in self.lines:
+            if not line:
+                continue
+            try:
+                message = loads(line)
+            except ValueError:
+                continue
+            chunk = message.get('response')
+            if chunk is None and 'message' in message:
+                # /api/chat streams message deltas instead
+                chunk = message['message'].get('content')
+            if chunk:
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                self.tokens += 1
+                text, words = self._normalize(chunk)
+                self.words += words
+                if self.words > self.max_words:
+                    self.truncated = True
+                    break
+                if text:
+                    self._parts.append(text)
+                yield chunk
+            if message.get('done', False):
+                self.eval_count = message.get('eval_count')
+                # Token state of the conversation so far (/api/generate only)
+                self.context = message.get('context')
+                break
+
+
+class StreamResult:
+    """Outcome of one streamed answer: the normalized text or an error message"""
+
+    def __init__(self):
+        self.text = ''
+        self.error = None
+
+
+class StreamSink:
+    """Receives LLM progress output; subclasses override what they need"""
+
+    def notice(self, message, level=logging.INFO):
+        pass
+
+    def open(self):
+        """Return the object that receives the chunks of one answer"""
+        return self
+
+    def write(self, chunk):
+        pass
+
+    def close(self, stream, elapsed):
+        pass
+
+
+class ConsoleSink(StreamSink):
+    """Interactive terminal output: spinner, answer text and timing"""
+
+    def notice(self, message, level=logging.INFO):
+        print(message)
+
+    def open(self):
+        print("\n🤔 Starting LLM processing...")
+        print("\nReceiving response:")
+        return _ConsoleWriter()
+
+
+class _ConsoleWriter(StreamSink):
+    spinner_chars = ['⠋', '⠙', '⠹', '⠸', '⠼', '⠴', '⠦', '⠧', '⠇', '⠏']
+
+    def __init__(self):
+        self.buffer = []
+        self.buffered = 0
+        self.spinner_idx = 0
+        self.last_update = time.time()
+        self.last_newline = True
+
+    def write(self, chunk):
+        self.buffer.append(chunk)
+        self.buffered += len(chunk)
+        # Print whole sentences (or long fragments) rather than single tokens
+        if self.buffered <= 50 and not any(p in chunk for p in '.!?\n;'):
+            return
+        text = ''.join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        current_time = time.time()
+        if current_time - self.last_update < 0.1:
+            return
+        spinner = self.spinner_chars[self.spinner_idx]
+        self.spinner_idx = (self.spinner_idx + 1) % len(self.spinner_chars)
+        self.last_update = current_time
+        if self.last_newline:
+            print(f"{spinner} {text}", end='')
+            self.last_newline = False
+        else:
+            print(text, end='')
+        if text.endswith('\n'):
+            self.last_newline = True
+        sys.stdout.flush()
+
+    def close(self, stream, elapsed):
+        if self.buffer:
+            print(''.join(self.buffer), end='')
+        # Ensure we end with a newline
+        if not self.last_newline:
+            print()
+        print(f"\n✨ Response completed in {elapsed:.1f} seconds")
+
+
+class LoggerSink(StreamSink):
+    """One log line per answer instead of per-token console output"""
+
+    def __init__(self, log=None, level=logging.INFO):
+        self.log = log or logger
+        self.level = level
+
+    def notice(self, message, level=logging.INFO):
+        self.log.log(level, message.strip())
+
+    def close(self, stream, elapsed):
+        self.log.log(self.level, f"LLM response: {stream.tokens} tokens, {stream.words} words in {elapsed:.1f}s")
+
+
+class CallbackSink(StreamSink):
+    """Forward every chunk (and optionally notices) to callables"""
+
+    def __init__(self, on_chunk, on_notice=None):
+        self.on_chunk = on_chunk
+        self.on_notice = on_notice
+
+    def notice(self, message, level=logging.INFO):
+        if self.on_notice is not None:
+            self.on_notice(message, level)
+
+    def write(self, chunk):
+        self.on_chunk(chunk)
+
+
+SINKS = {
+    'console': ConsoleSink,
+    'log': LoggerSink,
+}
+
+
+def create_sinks(names):
+    """Build sinks from names such as "console", "log" or ["console", "log"]; "none" disables output"""
+    if isinstance(names, str):
+        names = [names]
+    sinks = []
+    for name in names or []:
+        if name in (None, 'none'):
+            continue
+        if name not in SINKS:
+            raise ValueError(f"Unknown LLM output sink '{name}'. Available: {', '.join(sorted(SINKS))}, none")
+        sinks.append(SINKS[name]())
+    return sinks
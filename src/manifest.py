@@ -0,0 +1,68 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from src.sqlite_db import SQLiteConnections
+
+
+class IngestManifest:
+    """Record of processed input files, keyed by audio content hash.
+
+    Each stage checkpoints its output (transcript, answers, audio files), so
+    unchanged files are skipped on later runs and an interrupted file resumes
+    from the first stage that did not finish.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = SQLiteConnections(self.path)
+        self._db.connection().execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                content_hash TEXT PRIMARY KEY,
+                audio_file TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                state TEXT NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+
+    @staticmethod
+    def hash_file(path, block_size=1024 * 1024):
+        """Return the SHA-256 of a file's content"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def load(self, content_hash):
+        """Return the checkpointed state for a file, or an empty dict"""
+        row = self._db.connection().execute(
+            "SELECT state FROM files WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def checkpoint(self, content_hash, audio_file, stage, fields):
+        """Merge a finished stage's output into the file's record"""
+        conn = self._db.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT state FROM files WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+            state = json.loads(row[0]) if row else {}
+            state.update(fields)
+            conn.execute(
+                "INSERT OR REPLACE INTO files (content_hash, audio_file, stage, state, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (content_hash, str(audio_file), stage, json.dumps(state), time.time()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def forget(self, content_hash):
+        """Drop a file's record so it is processed from scratch next time"""
+        self._db.connection().execute("DELETE FROM files WHERE content_hash = ?", (content_hash,))
@@ -0,0 +1,283 @@
+"""Timing spans and metrics for the processing stages.
+
+Spans are written as one JSON object per line to a trace file, and every
+span also feeds a small in-process metrics registry that can be exported
+in Prometheus text format (to a file and/or an HTTP endpoint). Tags such as
+the input file and question index are carried in a context variable, so
+nested spans inherit them; use `bind` to carry them into worker threads.
+"""
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+_tags = contextvars.ContextVar('jarvis_tags', default={})
+_current_span = contextvars.ContextVar('jarvis_span', default=None)
+
+
+class Metrics:
+    """Counters and summaries rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+        self._help = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            count, total = self._summaries.get(key, (0, 0.0))
+            self._summaries[key] = (count + 1, total + value)
+
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ''
+        escape = lambda v: v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels) + '}'
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            summaries = sorted(self._summaries.items())
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), (count, total) in summaries:
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} summary")
+            lines.append(f"{name}_count{self._labels(labels)} {count}")
+            lines.append(f"{name}_sum{self._labels(labels)} {total:.6f}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write the metrics atomically so scrapers never read a partial file"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host='127.0.0.1'):
+        """Expose the metrics on http://host:port/metrics from a background thread"""
+        # Imported here: http.server is slow to import and rarely needed
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        return server
+
+
+class Span:
+    """One timed operation; attributes can be added while it runs"""
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+        self.attrs = {}
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def record(self):
+        record = {
+            "span": self.name,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6) if self.duration is not None else None,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+        }
+        record.update(self.tags)
+        record.update(self.attrs)
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class Tracer:
+    """Writes finished spans to a JSONL trace file and the metrics registry"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.trace_path = None
+        self._lock = threading.Lock()
+        self._file = None
+
+    def set_trace_file(self, path):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.trace_path = path
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                # Line-buffered appends keep lines whole across threads and processes
+                self._file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def emit(self, record):
+        self.metrics.observe('jarvis_span_seconds', record.get('duration') or 0.0, span=record['span'])
+        if record.get('error'):
+            self.metrics.inc('jarvis_span_errors_total', span=record['span'])
+        with self._lock:
+            if self._file is not None:
+                self._file.write(json.dumps(record, default=str) + '\n')
+
+    def start_span(self, name, **tags):
+        """Start a span without making it current (for generators and callbacks)"""
+        merged = dict(_tags.get())
+        merged.update(tags)
+        return Span(name, merged)
+
+    def end_span(self, current, error=None, emit=True):
+        if current.duration is not None:
+            # Already finished
+            return current
+        current.duration = current.elapsed()
+        if error is not None:
+            current.error = f"{type(error).__name__}: {error}"
+        if emit:
+            self.emit(current.record())
+        return current
+
+    @contextmanager
+    def span(self, name, emit=True, **tags):
+        """Time the block as a span; spans opened inside it inherit its tags"""
+        current = self.start_span(name, **tags)
+        tags_token = _tags.set(current.tags)
+        span_token = _current_span.set(current)
+        error = None
+        try:
+            yield current
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(span_token)
+            _tags.reset(tags_token)
+            self.end_span(current, error, emit)
+
+
+metrics = Metrics()
+metrics.describe('jarvis_span_seconds', "Time spent in each processing span")
+metrics.describe('jarvis_llm_time_to_first_token_seconds', "Delay before the first LLM token")
+metrics.describe('jarvis_llm_tokens_per_second', "LLM generation speed")
+metrics.describe('jarvis_llm_tokens_total', "LLM tokens received")
+metrics.describe('jarvis_tts_bytes_total', "Bytes of synthesized audio written")
+metrics.describe('jarvis_coalesced_total', "Requests answered by an identical request already in flight")
+metrics.describe('jarvis_persist_errors_total', "Conversations the background writer failed to save")
+tracer = Tracer(metrics)
+span = tracer.span
+
+
+@contextmanager
+def tagged(**tags):
+    """Attach tags (e.g. file, question) to every span opened inside the block"""
+    merged = dict(_tags.get())
+    merged.update(tags)
+    token = _tags.set(merged)
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def bind(fn):
+    """Return `fn` running in a copy of the current context (for worker threads).
+
+    Bind once per submitted task: a copied context can't be entered by two
+    threads at the same time.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def record_llm_stream(llm_span, time_to_first_token=None, tokens=0, generation_seconds=None, cached=False):
+    """Attach LLM streaming statistics to a span and the metrics registry"""
+    if cached:
+        llm_span.set(cached=True)
+        return
+    tokens_per_second = tokens / generation_seconds if generation_seconds else None
+    llm_span.set(
+        cached=False,
+        tokens=tokens,
+        time_to_first_token=round(time_to_first_token, 4) if time_to_first_token is not None else None,
+        tokens_per_second=round(tokens_per_second, 2) if tokens_per_second else None,
+    )
+    metrics.inc('jarvis_llm_tokens_total', tokens)
+    if time_to_first_token is not None:
+        metrics.observe('jarvis_llm_time_to_first_token_seconds', time_to_first_token)
+    if tokens_per_second:
+        metrics.observe('jarvis_llm_tokens_per_second', tokens_per_second)
+
+
+def configure_metrics(trace_file=None, metrics_file=None, metrics_port=None, write_interval=15.0):
+    """Enable the trace file and metrics exports; returns a function that flushes them"""
+    tracer.set_trace_file(trace_file)
+    if metrics_port:
+        metrics.serve(metrics_port)
+
+    def flush():
+        if metrics_file:
+            metrics.write(metrics_file)
+
+    if metrics_file and write_interval:
+        def write_periodically():
+            while True:
+                time.sleep(write_interval)
+                flush()
+        threading.Thread(target=write_periodically, name='metrics-file', daemon=True).start()
+    return flush
@@ -0,0 +1,136 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from src.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Marker telling the writer to shut down
+_STOP = object()
+
+
+class _Flush:
+    """Queue marker: fsync the metadata log and resolve `future`"""
+
+    def __init__(self):
+        self.future = Future()
+
+
+class PersistenceWriter:
+    """Background writer for finished conversations.
+
+    `submit` queues a conversation and returns a future right away, so slow
+    storage (e.g. a network mount) stays off the processing threads. The
+    writer thread renders each conversation's markdown in one buffer and
+    writes it atomically (temporary file + rename), appends the metadata of
+    everything queued meanwhile to the JSONL metadata log in one write, and
+    fsyncs the log every `fsync_every` conversations (0: only on flush/close).
+    The future resolves to the markdown file name, or to the error.
+    """
+
+    def __init__(self, file_handler, fsync_every=8, queue_size=64, max_batch=32):
+        self.file_handler = file_handler
+        self.fsync_every = max(0, int(fsync_every or 0))
+        self.max_batch = max(1, max_batch)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self._log = None
+        self._unsynced = 0
+        self._thread = threading.Thread(target=self._run, name='persist-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, original_audio, qa_pairs, audio_files, timestamp, chapters=None):
+        """Queue a conversation for writing; returns a Future"""
+        future = Future()
+        metadata = self.file_handler.conversation_metadata(
+            original_audio, qa_pairs, audio_files, timestamp, chapters
+        )
+        # Blocks only while the queue is full, which is the backpressure
+        self.queue.put((metadata, list(qa_pairs), datetime.now(), future))
+        return future
+
+    def flush(self):
+        """Wait until everything submitted so far is written and fsynced"""
+        marker = _Flush()
+        self.queue.put(marker)
+        marker.future.result()
+
+    def close(self):
+        """Write what is queued, fsync the log and stop the writer"""
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        try:
+            while True:
+                item = self.queue.get()
+                batch = []
+                # Take whatever else is already waiting, stopping at a marker
+                while item is not _STOP and not isinstance(item, _Flush):
+                    batch.append(item)
+                    if len(batch) >= self.max_batch:
+                        item = None
+                        break
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        item = None
+                        break
+                if batch:
+                    with span('persist_write', conversations=len(batch)):
+                        self._write_batch(batch)
+                if item is _STOP:
+                    self._sync()
+                    return
+                if isinstance(item, _Flush):
+                    try:
+                        self._sync()
+                        item.future.set_result(None)
+                    except Exception as e:
+                        item.future.set_exception(e)
+        finally:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def _write_batch(self, batch):
+        written = []
+        for metadata, qa_pairs, recorded, future in batch:
+            text_file = metadata["text_file"]
+            try:
+                self.file_handler.write_qa_text(qa_pairs, text_file, recorded, fsync=self.fsync_every == 1)
+                written.append((metadata, qa_pairs, future))
+            except Exception as e:
+                logger.error(f"Error saving {text_file}: {e}")
+                future.set_exception(e)
+        if not written:
+            return
+
+        try:
+            if self._log is None:
+                self._log = open(self.file_handler.metadata_log, 'a', encoding='utf-8')
+            self._unsynced += len(written)
+            fsync = bool(self.fsync_every) and self._unsynced >= self.fsync_every
+            self.file_handler.append_metadata([metadata for metadata, _, _ in written], self._log, fsync)
+            if fsync:
+                self._unsynced = 0
+        except Exception as e:
+            logger.error(f"Error saving conversation metadata: {e}")
+            for _, _, future in written:
+                future.set_exception(e)
+            return
+
+        for metadata, qa_pairs, future in written:
+            try:
+                self.file_handler.index_conversation(metadata, qa_pairs)
+            except Exception as e:
+                # The files are written; the index can be rebuilt from them
+                logger.error(f"Error indexing conversation {metadata['timestamp']}: {e}")
+            future.set_result(metadata["text_file"])
+
+    def _sync(self):
+        if self._log is not None and self._unsynced:
+            self.file_handler.append_metadata([], self._log, fsync=True)
+            self._unsynced = 0
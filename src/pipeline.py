@@ -0,0 +1,122 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Marker telling a stage worker to shut down
+_STOP = object()
+
+
+class Stage:
+    """One pipeline stage: a worker pool fed by a bounded input queue.
+
+    `func` takes an item and returns the item for the next stage, or None to
+    drop it (e.g. no wake word found). With `use_processes` the calls run in a
+    process pool, so `func` and its items must be picklable.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=8, use_processes=False):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.use_processes = use_processes
+        self._executor = None
+        self._threads = []
+
+    def start(self, emit):
+        """Start the workers; `emit` receives every non-None result"""
+        if self.use_processes:
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        for idx in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, args=(emit,), name=f"{self.name}-{idx}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _call(self, item):
+        if self._executor is not None:
+            return self._executor.submit(self.func, item).result()
+        return self.func(item)
+
+    def _work(self, emit):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            try:
+                result = self._call(item)
+            except Exception as e:
+                logger.exception(f"Stage '{self.name}' failed: {e}")
+                continue
+            if result is not None:
+                # Blocks while the next stage is full, which is the backpressure
+                emit(result)
+
+    def stop(self):
+        """Let queued items drain, then stop the workers"""
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+class Pipeline:
+    """Chain of stages joined by bounded queues.
+
+    Every stage runs concurrently, so a long backlog finishes in roughly the
+    time of its slowest stage rather than the sum of all of them.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.results = []
+        self._results_lock = threading.Lock()
+        self._running = False
+
+    def _collect(self, item):
+        with self._results_lock:
+            self.results.append(item)
+
+    def start(self):
+        if self._running:
+            return
+        # Start from the end so every emit target already has workers
+        for idx in reversed(range(len(self.stages))):
+            if idx + 1 < len(self.stages):
+                emit = self.stages[idx + 1].queue.put
+            else:
+                emit = self._collect
+            self.stages[idx].start(emit)
+        self._running = True
+
+    def submit(self, item):
+        """Queue an item for the first stage, blocking while it is full"""
+        if not self._running:
+            self.start()
+        self.stages[0].queue.put(item)
+
+    def close(self):
+        """Drain all stages in order and return the collected results"""
+        if self._running:
+            for stage in self.stages:
+                stage.stop()
+            self._running = False
+        return self.results
+
+    def run(self, items):
+        """Push all items through the pipeline and wait for completion"""
+        self.start()
+        try:
+            for item in items:
+                self.submit(item)
+        finally:
+            results = self.close()
+        return results
@@ -0,0 +1,74 @@
+import logging
+import numpy as np
+import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
+
+
+class SpeechPrescreen:
+    """Vectorized energy check that rejects or trims audio without speech.
+
+    The PCM is cut into fixed frames and each frame's RMS is computed with
+    NumPy in one pass. Audio with too little speech is rejected before it
+    reaches the recognizer; otherwise leading and trailing silence is
+    trimmed (keeping `padding_ms`) to shrink the upload.
+    """
+
+    def __init__(self, frame_ms=30, energy_threshold=300, min_speech_seconds=0.5,
+                 min_speech_ratio=0.02, trim=True, padding_ms=200):
+        self.frame_ms = frame_ms
+        self.energy_threshold = energy_threshold
+        self.min_speech_seconds = min_speech_seconds
+        self.min_speech_ratio = min_speech_ratio
+        self.trim = trim
+        self.padding_ms = padding_ms
+
+    def analyze(self, pcm, sample_rate, sample_width=2):
+        """Return per-file energy statistics and the frame-level speech mask"""
+        dtype = {1: np.int8, 2: np.int16, 4: np.int32}[sample_width]
+        samples = np.frombuffer(pcm, dtype=dtype).astype(np.float32)
+        frame_len = max(1, int(sample_rate * self.frame_ms / 1000))
+        n_frames = len(samples) // frame_len
+        frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+        frame_rms = np.sqrt(np.mean(frames * frames, axis=1)) if n_frames else np.zeros(0)
+        speech = frame_rms >= self.energy_threshold
+
+        stats = {
+            "duration": round(len(samples) / sample_rate, 2),
+            "rms": round(float(np.sqrt(np.mean(samples * samples))), 1) if len(samples) else 0.0,
+            "speech_ratio": round(float(speech.mean()), 3) if n_frames else 0.0,
+            "speech_seconds": round(float(speech.sum()) * self.frame_ms / 1000, 2),
+        }
+        return stats, speech, frame_len
+
+    def screen(self, audio):
+        """Return (audio or None, stats); None means the audio has no usable speech"""
+        pcm = audio.get_raw_data()
+        stats, speech, frame_len = self.analyze(pcm, audio.sample_rate, audio.sample_width)
+
+        if stats["speech_seconds"] < self.min_speech_seconds or stats["speech_ratio"] < self.min_speech_ratio:
+            logger.info(
+                f"Pre-screen rejected audio: {stats} "
+                f"(threshold={self.energy_threshold}, min_speech_seconds={self.min_speech_seconds}, "
+                f"min_speech_ratio={self.min_speech_ratio})"
+            )
+            return None, stats
+
+        # With both minimums at 0 silent audio gets here; leave it untrimmed
+        if self.trim and speech.any():
+            speech_frames = np.flatnonzero(speech)
+            padding = self.padding_ms // self.frame_ms
+            first = max(0, int(speech_frames[0]) - padding)
+            last = min(len(speech), int(speech_frames[-1]) + 1 + padding)
+            frame_bytes = frame_len * audio.sample_width
+            start, end = first * frame_bytes, last * frame_bytes
+            if last == len(speech):
+                end = len(pcm)
+            if start > 0 or end < len(pcm):
+                stats["trimmed_seconds"] = round(
+                    (len(pcm) - (end - start)) / (audio.sample_rate * audio.sample_width), 2
+                )
+                audio = sr.AudioData(pcm[start:end], audio.sample_rate, audio.sample_width)
+
+        logger.info(f"Pre-screen passed audio: {stats} (threshold={self.energy_threshold})")
+        return audio, stats
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from src.sqlite_db import SQLiteConnections
+
+
+class ResponseCache:
+    """On-disk LLM response cache with TTL and LRU eviction.
+
+    Entries live in a SQLite database, so several worker processes can share
+    one cache file safely. Entries expire after `ttl` seconds; once the cache
+    grows past `max_entries` or `max_bytes`, the least recently used entries
+    are evicted first.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=10000, max_bytes=50 * 1024 * 1024):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = SQLiteConnections(self.path, synchronous='NORMAL')
+        self._setup_database()
+
+    def _setup_database(self):
+        conn = self._db.connection()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @staticmethod
+    def make_key(model, prompt, options):
+        """Build a cache key from the model, normalized prompt and sampling options"""
+        normalized = ' '.join(prompt.lower().split())
+        payload = json.dumps([model, normalized, options or {}], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for `key`, or None if missing or expired"""
+        conn = self._db.connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT response, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        response, created = row
+        if self.ttl and now - created > self.ttl:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return response
+
+    def put(self, key, model, response):
+        """Store a response and evict old entries if the cache is over its limits"""
+        conn = self._db.connection()
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, size, created, accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, response, size, now, now),
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.ttl:
+                conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if self.max_entries and count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if self.max_bytes and total > self.max_bytes:
+                excess = total - self.max_bytes
+                freed = 0
+                stale = []
+                for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                    if freed >= excess:
+                        break
+                    stale.append((key,))
+                    freed += size
+                conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        """Remove every cached response"""
+        self._db.connection().execute("DELETE FROM responses")
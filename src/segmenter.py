@@ -0,0 +1,71 @@
+import audioop
+from collections import deque
+
+
+class SilenceSegmenter:
+    """Split a stream of PCM frames into speech segments at pauses.
+
+    Frames are classified by RMS energy. A segment ends after
+    `min_silence_ms` of silence or once it reaches `max_segment_s`; segments
+    that never rise above the threshold are dropped. Only the current
+    segment is held in memory, so arbitrarily long inputs can be processed.
+    """
+
+    def __init__(self, sample_rate=16000, sample_width=2, frame_ms=30, energy_threshold=300,
+                 min_silence_ms=600, max_segment_s=30, padding_ms=200):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frame_ms = frame_ms
+        self.energy_threshold = energy_threshold
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * sample_width
+        self.min_silence_frames = max(1, min_silence_ms // frame_ms)
+        self.max_segment_frames = max(1, int(max_segment_s * 1000) // frame_ms)
+        self.padding_frames = padding_ms // frame_ms
+
+    def is_speech(self, frame):
+        return audioop.rms(frame, self.sample_width) >= self.energy_threshold
+
+    def _segment(self, start, frames):
+        end = start + len(frames)
+        return (start * self.frame_ms / 1000, end * self.frame_ms / 1000, b''.join(frames))
+
+    def segments(self, frames):
+        """Yield (start_seconds, end_seconds, pcm_bytes) for each speech segment"""
+        # Leading silence kept in front of the next segment
+        lead = deque(maxlen=self.padding_frames) if self.padding_frames else None
+        current = []
+        start = 0
+        silence_run = 0
+        index = 0
+
+        for frame in frames:
+            speech = self.is_speech(frame)
+            if not current:
+                if speech:
+                    current = list(lead) if lead else []
+                    start = index - len(current)
+                    current.append(frame)
+                    silence_run = 0
+                elif lead is not None:
+                    lead.append(frame)
+                index += 1
+                continue
+
+            current.append(frame)
+            silence_run = 0 if speech else silence_run + 1
+            if silence_run >= self.min_silence_frames or len(current) >= self.max_segment_frames:
+                # Keep a little trailing silence, hand the rest to the next segment
+                trim = max(0, silence_run - self.padding_frames)
+                kept = current[:len(current) - trim] if trim else current
+                yield self._segment(start, kept)
+                if lead is not None:
+                    lead.clear()
+                    lead.extend(current[len(kept):])
+                current = []
+                silence_run = 0
+            index += 1
+
+        if current:
+            trim = max(0, silence_run - self.padding_frames)
+            kept = current[:len(current) - trim] if trim else current
+            yield self._segment(start, kept)
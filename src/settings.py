@@ -0,0 +1,115 @@
+try:
+    import config_local
+except ImportError:
+    # No config yet (fresh checkout): every setting falls back to its default
+    config_local = None
+
+# Settings checked by validate_settings, by kind
+_STRINGS = (
+    'OLLAMA_API_URL', 'MODEL_NAME', 'LANGUAGE', 'WAKE_WORD', 'OLLAMA_KEEP_ALIVE', 'STT_BACKEND',
+    'LLM_CACHE_PATH', 'INGEST_MANIFEST_PATH', 'TTS_CACHE_DIR', 'CONVERSATION_STORE_PATH',
+)
+_OPTIONAL_STRINGS = ('TRACE_FILE', 'METRICS_FILE', 'WAKE_WORD_MODEL_PATH', 'AUDIO_OUTPUT_BITRATE')
+_FLAGS = (
+    'PIPELINE_ENABLED', 'OLLAMA_WARM_UP', 'LLM_CACHE_ENABLED', 'INGEST_MANIFEST_ENABLED',
+    'TTS_CACHE_ENABLED', 'DECODE_IN_MEMORY', 'LLM_TTS_STREAMING', 'PRESCREEN_ENABLED',
+    'PRESCREEN_TRIM', 'LLM_FAST_JSON', 'CONVERSATION_STORE_ENABLED', 'PERSIST_ASYNC',
+    'COALESCE_REQUESTS',
+)
+_COUNTS = (
+    'PIPELINE_QUEUE_SIZE', 'LLM_MAX_PARALLEL', 'TTS_MAX_PARALLEL', 'STT_MAX_PARALLEL',
+    'WATCH_WORKERS', 'WATCH_QUEUE_SIZE', 'PERSIST_QUEUE_SIZE', 'LLM_EJECT_AFTER_FAILURES',
+)
+_NUMBERS = (
+    'LLM_CACHE_TTL', 'LLM_CACHE_MAX_ENTRIES', 'LLM_CACHE_MAX_BYTES', 'TTS_CACHE_MAX_BYTES',
+    'SEGMENTED_TRANSCRIPTION_MIN_BYTES', 'SEGMENT_ENERGY_THRESHOLD', 'SEGMENT_MIN_SILENCE_MS',
+    'SEGMENT_MAX_SECONDS', 'WATCH_STABLE_SECONDS', 'WATCH_POLL_INTERVAL', 'PRESCREEN_ENERGY_THRESHOLD',
+    'PRESCREEN_MIN_SPEECH_SECONDS', 'PRESCREEN_MIN_SPEECH_RATIO', 'METRICS_WRITE_INTERVAL',
+    'LLM_RETRIES', 'LLM_RETRY_BACKOFF', 'LLM_HEALTH_INTERVAL', 'AUDIO_TURN_GAP_SECONDS',
+    'PERSIST_FSYNC_EVERY',
+)
+_CHOICES = {
+    'LLM_CONVERSATION_MODE': (None, 'context', 'chat'),
+    'AUDIO_OUTPUT_FORMAT': (None, 'mp3', 'opus'),
+    'WAKE_WORD_ENGINE': (None, 'auto', 'vosk', 'sphinx'),
+}
+_PIPELINE_STAGES = ('decode', 'transcribe', 'llm', 'tts', 'persist')
+
+
+def setting(name, default=None):
+    """Read an optional setting from config_local, falling back to a default"""
+    return getattr(config_local, name, default)
+
+
+def config_loaded():
+    return config_local is not None
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_settings():
+    """Check the configuration before a run; returns a list of problems (empty if fine)"""
+    if config_local is None:
+        return ["config_local.py not found; copy config.py.template to config_local.py and edit it"]
+    problems = []
+    for name in ('OLLAMA_API_URL', 'MODEL_NAME'):
+        if setting(name) in (None, '', 'YOUR_MODEL_NAME'):
+            problems.append(f"{name} is not set")
+    for name in _STRINGS:
+        value = setting(name)
+        if value is not None and not isinstance(value, str):
+            problems.append(f"{name} should be a string, not {value!r}")
+    for name in _OPTIONAL_STRINGS:
+        value = setting(name)
+        if value is not None and not isinstance(value, str):
+            problems.append(f"{name} should be a string or None, not {value!r}")
+    for name in _FLAGS:
+        value = setting(name)
+        if value is not None and not isinstance(value, bool):
+            problems.append(f"{name} should be True or False, not {value!r}")
+    for name in _COUNTS:
+        value = setting(name)
+        if value is not None and not (isinstance(value, int) and not isinstance(value, bool) and value >= 1):
+            problems.append(f"{name} should be a whole number of at least 1, not {value!r}")
+    for name in _NUMBERS:
+        value = setting(name)
+        if value is not None and not (_is_number(value) and value >= 0):
+            problems.append(f"{name} should be a number of at least 0, not {value!r}")
+    for name, choices in _CHOICES.items():
+        value = setting(name, choices[1])
+        if value not in choices:
+            allowed = ', '.join(repr(choice) for choice in choices)
+            problems.append(f"{name} should be one of {allowed}, not {value!r}")
+
+    url = setting('OLLAMA_API_URL')
+    if isinstance(url, str) and url and not url.startswith(('http://', 'https://')):
+        problems.append(f"OLLAMA_API_URL should start with http:// or https://, not {url!r}")
+    endpoints = setting('OLLAMA_ENDPOINTS')
+    if endpoints is not None and (not isinstance(endpoints, (list, tuple)) or not all(
+            isinstance(e, str) and e.startswith(('http://', 'https://')) for e in endpoints)):
+        problems.append(f"OLLAMA_ENDPOINTS should be a list of http(s) URLs, not {endpoints!r}")
+    workers = setting('PIPELINE_WORKERS', {})
+    if not isinstance(workers, dict):
+        problems.append(f"PIPELINE_WORKERS should be a dict, not {workers!r}")
+    else:
+        for stage, count in workers.items():
+            if stage not in _PIPELINE_STAGES:
+                problems.append(f"PIPELINE_WORKERS has an unknown stage {stage!r} "
+                                f"(stages: {', '.join(_PIPELINE_STAGES)})")
+            elif not (isinstance(count, int) and not isinstance(count, bool) and count >= 1):
+                problems.append(f"PIPELINE_WORKERS[{stage!r}] should be at least 1, not {count!r}")
+    sensitivity = setting('WAKE_WORD_SENSITIVITY')
+    if sensitivity is not None and not (_is_number(sensitivity) and 0 <= sensitivity <= 1):
+        problems.append(f"WAKE_WORD_SENSITIVITY should be a number from 0 to 1, not {sensitivity!r}")
+    port = setting('METRICS_PORT')
+    if port is not None and not (isinstance(port, int) and 0 < port < 65536):
+        problems.append(f"METRICS_PORT should be a port number or None, not {port!r}")
+    if not isinstance(setting('STT_OPTIONS', {}), dict):
+        problems.append("STT_OPTIONS should be a dict")
+    output = setting('LLM_STREAM_OUTPUT', 'log')
+    for name in [output] if isinstance(output, str) or output is None else output:
+        if name not in (None, 'none', 'console', 'log'):
+            problems.append(f"LLM_STREAM_OUTPUT has an unknown sink {name!r} (console, log, none)")
+    return problems
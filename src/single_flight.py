@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import Future
+
+from src.metrics import metrics
+
+
+class Abandoned(Exception):
+    """The leading call stopped before producing a result; waiters should retry"""
+
+
+class SingleFlight:
+    """Merge concurrent calls for the same key into one.
+
+    The first caller of a key (the leader) does the work; callers arriving
+    while it is in flight wait for its result (or exception) instead of
+    repeating it. Nothing is kept once the call finishes, so this only
+    covers duplicates that overlap in time; the caches cover the rest.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def begin(self, key):
+        """Join the call for `key`; returns (future, True if the caller leads it)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                metrics.inc('jarvis_coalesced_total', kind=self.name)
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def finish(self, key, future, result=None, error=None):
+        """Publish the leader's result (or error) to every waiter"""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return fn(*args, **kwargs), sharing the call with concurrent callers of `key`"""
+        while True:
+            future, leader = self.begin(key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except Abandoned:
+                continue
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, future, error=e if isinstance(e, Exception) else Abandoned())
+            raise
+        self.finish(key, future, result)
+        return result
@@ -0,0 +1,32 @@
+import sqlite3
+import threading
+
+
+class SQLiteConnections:
+    """Per-thread connections to one SQLite database in WAL mode.
+
+    Used by the on-disk stores (response cache, ingest manifest, conversation
+    store): every thread gets its own connection in autocommit mode, and
+    SQLite handles locking between threads and worker processes.
+    `synchronous` sets the PRAGMA of the same name (None keeps SQLite's
+    default); `row_factory` is applied to each connection.
+    """
+
+    def __init__(self, path, synchronous=None, row_factory=None):
+        self.path = str(path)
+        self.synchronous = synchronous
+        self.row_factory = row_factory
+        self._local = threading.local()
+
+    def connection(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if self.synchronous is not None:
+                conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            self._local.conn = conn
+        return conn
@@ -0,0 +1,126 @@
+import json
+import time
+import speech_recognition as sr
+
+
+class TranscriptionResult:
+    """Uniform result returned by every speech-to-text backend"""
+
+    def __init__(self, text, confidence=None, start=None, end=None, elapsed=None, backend=None):
+        self.text = text
+        self.confidence = confidence  # 0.0-1.0, None if the backend doesn't report it
+        self.start = start            # Offset of the audio within the recording, in seconds
+        self.end = end
+        self.elapsed = elapsed        # Recognition time in seconds
+        self.backend = backend
+
+    def to_dict(self):
+        return {
+            "text": self.text,
+            "confidence": self.confidence,
+            "start": self.start,
+            "end": self.end,
+            "elapsed": self.elapsed,
+            "backend": self.backend,
+        }
+
+
+class STTBackend:
+    """Base class for speech-to-text engines.
+
+    `transcribe` takes an `sr.AudioData` and returns a TranscriptionResult.
+    Like `speech_recognition`, it raises `sr.UnknownValueError` when no speech
+    is recognized and `sr.RequestError` when the engine itself fails.
+    """
+
+    name = None
+
+    def __init__(self, language='en-US'):
+        self.language = language
+
+    def _recognize(self, audio):
+        raise NotImplementedError
+
+    def transcribe(self, audio, start=None, end=None):
+        started = time.time()
+        text, confidence = self._recognize(audio)
+        if not text:
+            raise sr.UnknownValueError()
+        return TranscriptionResult(
+            text, confidence, start=start, end=end,
+            elapsed=time.time() - started, backend=self.name,
+        )
+
+
+class GoogleBackend(STTBackend):
+    """Google Web Speech API (network)"""
+
+    name = 'google'
+
+    def __init__(self, language='en-US'):
+        super().__init__(language)
+        self.recognizer = sr.Recognizer()
+
+    def _recognize(self, audio):
+        response = self.recognizer.recognize_google(audio, language=self.language, show_all=True)
+        alternatives = response.get('alternative', []) if isinstance(response, dict) else []
+        if not alternatives:
+            return None, None
+        best = alternatives[0]
+        return best.get('transcript'), best.get('confidence')
+
+
+class SphinxBackend(STTBackend):
+    """CMU PocketSphinx (offline, needs the `pocketsphinx` package)"""
+
+    name = 'sphinx'
+
+    def __init__(self, language='en-US'):
+        super().__init__(language)
+        self.recognizer = sr.Recognizer()
+
+    def _recognize(self, audio):
+        return self.recognizer.recognize_sphinx(audio, language=self.language), None
+
+
+class VoskBackend(STTBackend):
+    """Vosk/Kaldi (offline, needs the `vosk` package and a downloaded model)"""
+
+    name = 'vosk'
+
+    def __init__(self, language='en-US', model_path='model'):
+        super().__init__(language)
+        try:
+            import vosk
+        except ImportError as e:
+            raise sr.RequestError("missing vosk module: ensure that vosk is set up correctly.") from e
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        # Loading a model is expensive; recognizers built from it are cheap
+        self.model = vosk.Model(model_path)
+
+    def _recognize(self, audio):
+        rate = 16000
+        recognizer = self._vosk.KaldiRecognizer(self.model, rate)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=rate, convert_width=2))
+        result = json.loads(recognizer.FinalResult())
+        words = result.get('result', [])
+        confidence = sum(word['conf'] for word in words) / len(words) if words else None
+        return result.get('text'), confidence
+
+
+BACKENDS = {
+    GoogleBackend.name: GoogleBackend,
+    SphinxBackend.name: SphinxBackend,
+    VoskBackend.name: VoskBackend,
+}
+
+
+def create_backend(name='google', **options):
+    """Create a speech-to-text backend by its config name"""
+    try:
+        backend_class = BACKENDS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown STT backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return backend_class(**options)
@@ -1,3 +1,40 @@
+import re
+
+# Sentence boundaries used to cut text into speech segments
+SENTENCE_END = re.compile(r'(?<=[.!?:])\s+')
+
+
+def split_sentences(text):
+    """Split text into normalized sentence-level segments"""
+    return [' '.join(part.split()) for part in SENTENCE_END.split(text) if part.strip()]
+
+
+def end_sentence(text):
+    """Strip `text` and end it with a period unless it already ends a sentence"""
+    text = text.strip()
+    return text if text.endswith(('.', '!', '?')) else text + "."
+
+
+class SentenceBuffer:
+    """Collect streamed text and release it one complete sentence at a time"""
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, chunk):
+        """Add a chunk and return the sentences it completed"""
+        self._buffer += chunk
+        parts = SENTENCE_END.split(self._buffer)
+        # The last part may still be growing
+        self._buffer = parts.pop()
+        return [' '.join(part.split()) for part in parts if part.strip()]
+
+    def flush(self):
+        """Return whatever is left once the stream has ended"""
+        rest, self._buffer = self._buffer, ""
+        return split_sentences(rest)
+
+
 class TextProcessor:
     def __init__(self, wake_word="jarvis"):
         self.wake_word = wake_word.lower()
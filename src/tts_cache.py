@@ -0,0 +1,84 @@
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+
+class SpeechCache:
+    """Bounded on-disk cache of synthesized speech segments.
+
+    Segments are stored as one file per (text, lang) hash. Hits refresh the
+    file's modification time, and once the cache grows past `max_bytes` the
+    least recently used segments are removed.
+    """
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, evict_every=50):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._evict()
+
+    @staticmethod
+    def make_key(text, lang):
+        normalized = ' '.join(text.split())
+        return hashlib.sha256(f"{lang}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def _path(self, text, lang):
+        return self.cache_dir / f"{self.make_key(text, lang)}.mp3"
+
+    def get(self, text, lang):
+        """Return the cached audio bytes for a segment, or None"""
+        path = self._path(text, lang)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def put(self, text, lang, data):
+        """Store a segment atomically, so concurrent readers never see partial files"""
+        path = self._path(text, lang)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            self._puts += 1
+            evict = self._puts % self.evict_every == 0
+        if evict:
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used segments until the cache fits in max_bytes"""
+        if not self.max_bytes:
+            return
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob('*.mp3'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
@@ -0,0 +1,63 @@
+import json
+import logging
+import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
+
+
+class WakeWordDetector:
+    """Cheap offline check for the wake word before a full transcription.
+
+    Uses a Vosk recognizer restricted to a one-word grammar when a Vosk model
+    is available, otherwise PocketSphinx keyword spotting. `detect` returns
+    None when no local engine is installed, meaning "can't tell": callers
+    should then fall back to full transcription.
+
+    `sensitivity` (0-1) is PocketSphinx's keyword sensitivity: higher values
+    miss fewer wake words but accept more false ones.
+    """
+
+    def __init__(self, wake_word, engine='auto', model_path=None, sensitivity=0.85):
+        self.wake_word = wake_word.lower()
+        self.sensitivity = sensitivity
+        self.engine = None
+        self._recognizer = sr.Recognizer()
+        self._vosk_model = None
+
+        if engine in ('auto', 'vosk') and model_path:
+            try:
+                import vosk
+                vosk.SetLogLevel(-1)
+                self._vosk = vosk
+                self._vosk_model = vosk.Model(model_path)
+                self.engine = 'vosk'
+            except Exception as e:
+                logger.info(f"Vosk wake word engine unavailable: {e}")
+        if self.engine is None and engine in ('auto', 'sphinx'):
+            try:
+                import pocketsphinx  # noqa: F401
+                self.engine = 'sphinx'
+            except ImportError:
+                logger.info("PocketSphinx wake word engine unavailable")
+        if self.engine is None:
+            logger.info("No local wake word engine; every utterance will be fully transcribed")
+
+    def detect(self, audio):
+        """Return True/False if the wake word is (not) in `audio`, None if unknown"""
+        if self.engine == 'vosk':
+            recognizer = self._vosk.KaldiRecognizer(
+                self._vosk_model, 16000, json.dumps([self.wake_word, "[unk]"])
+            )
+            recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=16000, convert_width=2))
+            return self.wake_word in json.loads(recognizer.FinalResult()).get('text', '')
+        if self.engine == 'sphinx':
+            try:
+                hypothesis = self._recognizer.recognize_sphinx(
+                    audio, keyword_entries=[(self.wake_word, self.sensitivity)]
+                )
+            except sr.UnknownValueError:
+                return False
+            except sr.RequestError:
+                return None
+            return self.wake_word in hypothesis.lower()
+        return None
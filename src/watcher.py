@@ -0,0 +1,219 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import queue
+import select
+import signal
+import struct
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# inotify event masks (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifySource:
+    """Directory change notifications from Linux inotify"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def read(self, timeout):
+        """Return names of files that changed, waiting at most `timeout` seconds"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    """Fallback change detection by periodically listing the directory"""
+
+    def __init__(self, directory, interval=2.0):
+        self.directory = Path(directory)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def read(self, timeout):
+        time.sleep(max(timeout, self.interval))
+        snapshot = self._scan()
+        changed = [name for name, sig in snapshot.items() if self._snapshot.get(name) != sig]
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class DirectoryWatcher:
+    """Report files in a directory once they have stopped growing.
+
+    Only files named in change notifications are stat()ed, so the cost of
+    watching does not grow with the number of files already in the directory.
+    """
+
+    def __init__(self, directory, suffixes=('.m4a',), stable_seconds=2.0, poll_interval=2.0):
+        self.directory = Path(directory)
+        self.suffixes = tuple(suffix.lower() for suffix in suffixes)
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+
+    def _matches(self, name):
+        return name.lower().endswith(self.suffixes) and not name.startswith('.')
+
+    def _open_source(self):
+        try:
+            source = InotifySource(self.directory)
+            logger.info(f"Watching {self.directory} with inotify")
+            return source
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify unavailable ({e}); polling {self.directory} every {self.poll_interval}s")
+            return PollingSource(self.directory, self.poll_interval)
+
+    def events(self, stop_event):
+        """Yield names of stable files until `stop_event` is set"""
+        source = self._open_source()
+        # name -> ((size, mtime), time the signature was first seen)
+        pending = {name: None for name in os.listdir(self.directory) if self._matches(name)}
+        try:
+            while not stop_event.is_set():
+                timeout = min(0.5, self.stable_seconds) if pending else 1.0
+                for name in source.read(timeout):
+                    if self._matches(name):
+                        pending.setdefault(name, None)
+
+                now = time.monotonic()
+                for name in list(pending):
+                    try:
+                        stat = (self.directory / name).stat()
+                    except FileNotFoundError:
+                        del pending[name]
+                        continue
+                    signature = (stat.st_size, stat.st_mtime_ns)
+                    seen = pending[name]
+                    if seen is None or seen[0] != signature:
+                        pending[name] = (signature, now)
+                    elif stat.st_size > 0 and now - seen[1] >= self.stable_seconds:
+                        del pending[name]
+                        yield name
+        finally:
+            source.close()
+
+
+class WatchDaemon:
+    """Feed stable files from a DirectoryWatcher to worker threads.
+
+    Files go through a bounded queue, so a slow backend stalls the watcher
+    instead of growing memory. SIGINT/SIGTERM stop the watcher, and the
+    queued and in-flight files are finished before `run` returns.
+    """
+
+    def __init__(self, watcher, handler, workers=2, queue_size=16):
+        self.watcher = watcher
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.stop_event = threading.Event()
+        self._queued = set()
+        self._queued_lock = threading.Lock()
+
+    def _work(self):
+        while True:
+            name = self.queue.get()
+            if name is None:
+                return
+            try:
+                self.handler(name)
+            except Exception as e:
+                logger.exception(f"Failed to process {name}: {e}")
+            finally:
+                with self._queued_lock:
+                    self._queued.discard(name)
+
+    def _enqueue(self, name):
+        with self._queued_lock:
+            if name in self._queued:
+                return
+            self._queued.add(name)
+        # Wait for room, but give up if shutdown is requested meanwhile
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(name, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        with self._queued_lock:
+            self._queued.discard(name)
+
+    def stop(self, *_):
+        if not self.stop_event.is_set():
+            logger.info("Shutdown requested; finishing queued files...")
+        self.stop_event.set()
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self._work, name=f"watch-{idx}", daemon=True)
+            for idx in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        previous = {}
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                previous[sig] = signal.signal(sig, self.stop)
+        try:
+            for name in self.watcher.events(self.stop_event):
+                logger.info(f"New audio file ready: {name}")
+                self._enqueue(name)
+        finally:
+            self.stop_event.set()
+            for _ in threads:
+                self.queue.put(None)
+            for thread in threads:
+                thread.join()
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+        logger.info("Watch mode stopped")